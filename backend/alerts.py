@@ -0,0 +1,235 @@
+import argparse
+import bisect
+import json
+import sys
+import time
+
+from .database import create_table, get_connection, normalize_type_bien, normalize_ville
+
+
+def create_alert_tables(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS recherches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT,
+            ville TEXT,
+            ville_norm TEXT,
+            type_bien TEXT,
+            type_bien_norm TEXT,
+            surface_min REAL,
+            prix_max INTEGER,
+            creee INTEGER
+        );
+        -- Boîte d'envoi : une ligne par (recherche, annonce, prix) trouvée
+        -- après un passage ; envoyee passe à 1 une fois l'alerte transmise
+        CREATE TABLE IF NOT EXISTS alertes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recherche_id INTEGER NOT NULL,
+            logement_id INTEGER NOT NULL,
+            passage_id INTEGER,
+            epoch INTEGER,
+            prix INTEGER,
+            envoyee INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (recherche_id, logement_id, prix)
+        );
+        CREATE INDEX IF NOT EXISTS idx_alertes_envoi ON alertes (envoyee, id);
+        CREATE INDEX IF NOT EXISTS idx_alertes_recherche ON alertes (recherche_id, id);
+    """)
+
+
+def _bucket_key(ville_norm, type_bien_norm):
+    return (ville_norm or None, type_bien_norm or None)
+
+
+class _Bucket:
+    # Recherches d'un même couple (ville, type) : seuils triés pour bisect
+    def __init__(self):
+        self.prix = []      # (prix_max, id), prix_max croissant
+        self.surface = []   # (surface_min, id), surface_min croissante
+        self.criteria = {}  # id -> (surface_min, prix_max)
+
+    def add(self, search_id, surface_min, prix_max):
+        self.prix.append((prix_max if prix_max else float("inf"), search_id))
+        self.surface.append((surface_min if surface_min else float("-inf"), search_id))
+        self.criteria[search_id] = (surface_min or None, prix_max or None)
+
+    def freeze(self):
+        self.prix.sort()
+        self.surface.sort()
+
+    def match(self, prix, surface):
+        # Recherches avec prix_max >= prix : suffixe ; surface_min <= surface :
+        # préfixe. On parcourt la plus courte des deux et on vérifie l'autre
+        # critère : le coût suit le nombre de candidats, pas de recherches
+        start = bisect.bisect_left(self.prix, (prix, float("-inf")))
+        end = bisect.bisect_right(self.surface, (surface, float("inf")))
+        if len(self.prix) - start <= end:
+            for _, search_id in self.prix[start:]:
+                surface_min = self.criteria[search_id][0]
+                if surface_min is None or surface >= surface_min:
+                    yield search_id
+        else:
+            for _, search_id in self.surface[:end]:
+                prix_max = self.criteria[search_id][1]
+                if prix_max is None or prix <= prix_max:
+                    yield search_id
+
+
+class SearchIndex:
+    """Index inversé des recherches enregistrées.
+
+    Un seau par couple (ville_norm, type_bien_norm), None jouant le rôle de
+    joker : une annonce ne consulte que ses quatre seaux possibles.
+    """
+
+    def __init__(self, searches):
+        self.buckets = {}
+        for search_id, ville_norm, type_bien_norm, surface_min, prix_max in searches:
+            key = _bucket_key(ville_norm, type_bien_norm)
+            self.buckets.setdefault(key, _Bucket()).add(search_id, surface_min, prix_max)
+        for bucket in self.buckets.values():
+            bucket.freeze()
+
+    def match(self, listing):
+        # Mêmes règles que filter_clause : nettoyage, égalités normalisées, seuils
+        if not (listing["actif"] and listing["prix"] > 100 and listing["surface"] > 10 and listing["prix_m2"] > 5):
+            return []
+        ville, type_bien = listing["ville_norm"], listing["type_bien_norm"]
+        matches = []
+        for key in {(ville, type_bien), (ville, None), (None, type_bien), (None, None)}:
+            bucket = self.buckets.get(key)
+            if bucket:
+                matches.extend(bucket.match(listing["prix"], listing["surface"]))
+        return matches
+
+
+def load_index(conn):
+    return SearchIndex(conn.execute(
+        "SELECT id, ville_norm, type_bien_norm, surface_min, prix_max FROM recherches"
+    ))
+
+
+def record_alerts(conn, run_id, now, logement_ids):
+    """Confronte les annonces nouvelles ou modifiées du passage aux recherches enregistrées."""
+    if not logement_ids:
+        return 0
+    index = load_index(conn)
+    if not index.buckets:
+        return 0
+
+    alerts = []
+    for start in range(0, len(logement_ids), 500):
+        chunk = logement_ids[start:start + 500]
+        c = conn.execute(f"""
+            SELECT id, actif, prix, surface, prix_m2, ville_norm, type_bien_norm FROM logements
+            WHERE id IN ({", ".join("?" * len(chunk))})
+        """, chunk)
+        columns = [d[0] for d in c.description]
+        for row in c:
+            listing = dict(zip(columns, row))
+            for search_id in index.match(listing):
+                alerts.append((search_id, listing["id"], run_id, now, listing["prix"]))
+
+    # Une annonce déjà signalée ne réalerte que si son prix passe sous le plus
+    # bas déjà signalé pour cette recherche : ni le même prix ni une hausse
+    before = conn.total_changes
+    conn.executemany("""
+        INSERT OR IGNORE INTO alertes (recherche_id, logement_id, passage_id, epoch, prix)
+        SELECT ?1, ?2, ?3, ?4, ?5
+        WHERE NOT EXISTS (
+            SELECT 1 FROM alertes WHERE recherche_id = ?1 AND logement_id = ?2 AND prix <= ?5
+        )
+    """, alerts)
+    return conn.total_changes - before
+
+
+def create_search(conn, nom=None, ville=None, type_bien=None, surface_min=None, prix_max=None):
+    search_id = conn.execute("""
+        INSERT INTO recherches (nom, ville, ville_norm, type_bien, type_bien_norm, surface_min, prix_max, creee)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        nom, ville, normalize_ville(ville), type_bien, normalize_type_bien(type_bien),
+        surface_min or None, prix_max or None, int(time.time()),
+    )).lastrowid
+    conn.commit()
+    return search_id
+
+
+def delete_search(conn, search_id):
+    # Les alertes pas encore envoyées de la recherche partent avec elle
+    deleted = conn.execute("DELETE FROM recherches WHERE id = ?", (search_id,)).rowcount
+    conn.execute("DELETE FROM alertes WHERE recherche_id = ? AND envoyee = 0", (search_id,))
+    conn.commit()
+    return deleted > 0
+
+
+def list_searches(conn):
+    c = conn.execute("SELECT id, nom, ville, type_bien, surface_min, prix_max, creee FROM recherches ORDER BY id")
+    columns = [d[0] for d in c.description]
+    return [dict(zip(columns, row)) for row in c]
+
+
+def list_alerts(conn, recherche_id=None, apres=0, limit=100):
+    """Alertes d'id > apres (lecture incrémentale), avec l'annonce correspondante."""
+    query = """
+        SELECT a.id, a.recherche_id, a.logement_id, a.passage_id, a.epoch, a.prix, a.envoyee,
+               l.titre, l.surface, l.type_bien, l.ville, l.url
+        FROM alertes a JOIN logements l ON l.id = a.logement_id
+        WHERE a.id > ?
+    """
+    params = [apres]
+    if recherche_id is not None:
+        query += " AND a.recherche_id = ?"
+        params.append(recherche_id)
+    query += " ORDER BY a.id LIMIT ?"
+    params.append(limit)
+    c = conn.execute(query, params)
+    columns = [d[0] for d in c.description]
+    return [dict(zip(columns, row)) for row in c]
+
+
+def pending_alerts(conn, limit):
+    # Alertes pas encore envoyées, avec la recherche et l'annonce
+    c = conn.execute("""
+        SELECT a.id, a.recherche_id, r.nom, a.logement_id, a.epoch, a.prix,
+               l.titre, l.surface, l.type_bien, l.ville, l.url
+        FROM alertes a
+        JOIN recherches r ON r.id = a.recherche_id
+        JOIN logements l ON l.id = a.logement_id
+        WHERE a.envoyee = 0
+        ORDER BY a.id LIMIT ?
+    """, (limit,))
+    columns = [d[0] for d in c.description]
+    return [dict(zip(columns, row)) for row in c]
+
+
+def drain(conn, sink, limit=1000):
+    """Écrit les alertes non envoyées dans sink (NDJSON) et les marque envoyées."""
+    sent = 0
+    while True:
+        pending = pending_alerts(conn, limit)
+        if not pending:
+            return sent
+        for alert in pending:
+            sink.write(json.dumps(alert, ensure_ascii=False) + "\n")
+        sink.flush()
+        conn.executemany("UPDATE alertes SET envoyee = 1 WHERE id = ?", [(a["id"],) for a in pending])
+        conn.commit()
+        sent += len(pending)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Envoie les alertes en attente dans un fichier NDJSON")
+    parser.add_argument("fichier", help="fichier de sortie (ajout en fin), - pour la sortie standard")
+    args = parser.parse_args()
+    create_table()
+    conn = get_connection()
+    try:
+        if args.fichier == "-":
+            sent = drain(conn, sys.stdout)
+        else:
+            with open(args.fichier, "a", encoding="utf-8") as f:
+                sent = drain(conn, f)
+    finally:
+        conn.close()
+    print(f"{sent} alertes envoyées", file=sys.stderr)
@@ -1,14 +1,194 @@
+import hashlib
+import queue
 import sqlite3
 import os
+import threading
+import unicodedata
+from contextlib import contextmanager
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "../data/logements.db")
+from .metrics import span
 
-def get_connection():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    return sqlite3.connect(DB_PATH)
+DB_PATH = os.environ.get(
+    "LOGEMENTS_DB", os.path.join(os.path.dirname(__file__), "../data/logements.db")
+)
 
-def create_table():
-    conn = get_connection()
+# Colonnes renvoyées par l'API (les colonnes normalisées restent internes)
+COLUMNS = [
+    "id", "titre", "prix", "surface", "prix_m2",
+    "type_bien", "ville", "site_source", "image", "url", "date_scraping"
+]
+
+# Clés de tri proposées par /logements (toujours départagées par id)
+SORT_KEYS = ["prix_m2", "prix", "surface", "date_scraping"]
+# Colonnes du nettoyage (prix > 100, surface > 10, prix_m2 > 5)
+CLEANUP_COLUMNS = ["prix", "surface", "prix_m2"]
+
+# Index composites, pour chaque clé de tri : égalités (ville, type) puis
+# (clé, id) pour que ORDER BY clé, id et la pagination par curseur se lisent
+# directement dans l'index, puis les colonnes du nettoyage pour filtrer sans
+# relire la table
+def _build_indexes():
+    indexes = {}
+    for sort_key in SORT_KEYS:
+        residual = [column for column in CLEANUP_COLUMNS if column != sort_key]
+        for name, prefix in (
+            ("ville_type", ["ville_norm", "type_bien_norm"]),
+            ("ville", ["ville_norm"]),
+            ("type", ["type_bien_norm"]),
+            (None, []),
+        ):
+            index = "_".join(filter(None, ["idx_logements", name, sort_key]))
+            indexes[index] = ", ".join(prefix + [sort_key, "id"] + residual)
+    return indexes
+
+INDEXES = _build_indexes()
+
+# Colonnes ajoutées après la première version du schéma (migrées par create_table)
+ADDED_COLUMNS = {
+    "ville_norm": "TEXT",
+    "type_bien_norm": "TEXT",
+    # Ingestion incrémentale : empreinte du contenu, annonce encore en ligne,
+    # première apparition et dernière modification (epoch)
+    "content_hash": "TEXT",
+    "actif": "INTEGER NOT NULL DEFAULT 1",
+    "premiere_vue": "INTEGER",
+    "maj": "INTEGER",
+    # Groupe de doublons (id du représentant), calculé par dedup.assign_clusters
+    "cluster_id": "INTEGER",
+}
+
+# Champs scrapés, dans l'ordre des tuples produits par le scraper
+SCRAPED_COLUMNS = [
+    "titre", "prix", "surface", "prix_m2", "type_bien",
+    "ville", "site_source", "image", "url", "date_scraping"
+]
+
+
+def normalize_ville(ville):
+    if not ville:
+        return None
+
+    v = unicodedata.normalize("NFKD", ville.strip().lower())
+    return "".join(ch for ch in v if not unicodedata.combining(ch))
+
+
+def normalize_type_bien(type_bien):
+    if not type_bien:
+        return None
+
+    t = type_bien.strip().upper()
+    if "STUDIO" in t: return "STUDIO"
+    if "T1" in t: return "T1"
+    if "T2" in t: return "T2"
+    if "T3" in t: return "T3"
+    return t
+
+
+def content_hash(titre, prix, surface, prix_m2, type_bien, ville, site_source, image, url):
+    # date_scraping exclue : une annonce identique ne doit pas être réécrite
+    payload = "\x1f".join("" if v is None else str(v) for v in (
+        titre, prix, surface, prix_m2, type_bien, ville, site_source, image, url
+    ))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def get_connection(db_path=None, **kwargs):
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    return sqlite3.connect(db_path, **kwargs)
+
+# Connexions de lecture de l'API : lecture seule, mmap de 256 Mo, cache de
+# pages de 64 Mo par connexion, tables temporaires en mémoire
+READ_POOL_SIZE = int(os.environ.get("READ_POOL_SIZE", "8"))
+READ_PRAGMAS = [
+    "PRAGMA query_only = 1",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+]
+
+
+class ReadPool:
+    """Pool borné de connexions en lecture seule, partagé par les threads d'un worker.
+
+    La base est en WAL (réglage persistant posé par create_table) : les
+    lecteurs ne bloquent pas le scraper. Chaque connexion garde ses requêtes
+    préparées (cached_statements) : les requêtes de l'API ont un texte stable,
+    seuls les paramètres changent.
+    """
+
+    def __init__(self, db_path=None, size=READ_POOL_SIZE):
+        self.db_path = os.path.abspath(db_path or DB_PATH)
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.Semaphore(size)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False, cached_statements=256,
+        )
+        for pragma in READ_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        # L'attente d'une connexion libre compte dans l'étape « connexion »
+        with span("connexion"):
+            self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                with span("connexion"):
+                    conn = self._connect()
+            try:
+                yield conn
+            except sqlite3.Error:
+                # Connexion dans un état inconnu : fermée, une autre sera ouverte
+                conn.close()
+                raise
+            except BaseException:
+                self._idle.put(conn)
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def warm_up(self, statements):
+        # Ouvre toutes les connexions et y prépare les requêtes données
+        conns = [self._connect() for _ in range(self.size - self._idle.qsize())]
+        for conn in conns + list(self._idle.queue):
+            for sql in statements:
+                conn.execute(sql).fetchall()
+        for conn in conns:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_read_pools = {}
+_read_pools_lock = threading.Lock()
+
+def read_pool(db_path=None):
+    # Un pool par fichier et par processus (chaque worker uvicorn a le sien)
+    path = os.path.abspath(db_path or DB_PATH)
+    with _read_pools_lock:
+        if path not in _read_pools:
+            _read_pools[path] = ReadPool(path)
+        return _read_pools[path]
+
+def read_connection(db_path=None):
+    return read_pool(db_path).connection()
+
+
+def create_table(db_path=None):
+    conn = get_connection(db_path)
     c = conn.cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS logements (
@@ -25,8 +205,113 @@ def create_table():
             date_scraping TEXT
         )
     """)
+    # WAL : les lecteurs de l'API continuent de lire l'état publié pendant
+    # que le scraper écrit (réglage persistant, stocké dans le fichier)
+    c.execute("PRAGMA journal_mode=WAL")
+
+    # Migration des bases créées avant les colonnes ajoutées
+    existing = {row[1] for row in c.execute("PRAGMA table_info(logements)")}
+    for column, definition in ADDED_COLUMNS.items():
+        if column not in existing:
+            c.execute(f"ALTER TABLE logements ADD COLUMN {column} {definition}")
+
+    conn.create_function("normalize_ville", 1, normalize_ville, deterministic=True)
+    conn.create_function("normalize_type_bien", 1, normalize_type_bien, deterministic=True)
+    conn.create_function("content_hash", 9, content_hash, deterministic=True)
+    c.execute("""
+        UPDATE logements
+        SET ville_norm = normalize_ville(ville),
+            type_bien_norm = normalize_type_bien(type_bien)
+        WHERE (ville_norm IS NULL AND ville IS NOT NULL)
+           OR (type_bien_norm IS NULL AND type_bien IS NOT NULL)
+    """)
+    c.execute("""
+        UPDATE logements
+        SET content_hash = content_hash(titre, prix, surface, prix_m2, type_bien, ville, site_source, image, url),
+            premiere_vue = COALESCE(premiere_vue, CAST(strftime('%s', date_scraping) AS INTEGER)),
+            maj = COALESCE(maj, CAST(strftime('%s', date_scraping) AS INTEGER))
+        WHERE content_hash IS NULL
+    """)
+
+    # Une annonce = (url, titre) : une page de résidence ImmoJeune liste
+    # plusieurs logements sous la même url
+    if not c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_logements_annonce'"
+    ).fetchone():
+        c.execute("DELETE FROM logements WHERE id NOT IN (SELECT MAX(id) FROM logements GROUP BY url, titre)")
+        c.execute("CREATE UNIQUE INDEX idx_logements_annonce ON logements (url, titre)")
+
+    # Index partiels sur les annonces actives ; un index dont la définition a
+    # changé est reconstruit
+    for name, columns in INDEXES.items():
+        sql = f"CREATE INDEX {name} ON logements ({columns}) WHERE actif = 1"
+        current = c.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)
+        ).fetchone()
+        if current and current[0] == sql:
+            continue
+        if current:
+            c.execute(f"DROP INDEX {name}")
+        c.execute(sql)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_logements_cluster ON logements (cluster_id) WHERE actif = 1")
+
+    # Recherche plein texte sur titre et ville (accents ignorés), tenue à jour
+    # par des triggers : toute insertion du scraper est indexée dans la même transaction
+    fts_exists = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logements_fts'"
+    ).fetchone()
+    c.executescript("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS logements_fts USING fts5(
+            titre, ville,
+            content = 'logements', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS logements_fts_ai AFTER INSERT ON logements BEGIN
+            INSERT INTO logements_fts (rowid, titre, ville) VALUES (new.id, new.titre, new.ville);
+        END;
+        CREATE TRIGGER IF NOT EXISTS logements_fts_ad AFTER DELETE ON logements BEGIN
+            INSERT INTO logements_fts (logements_fts, rowid, titre, ville)
+            VALUES ('delete', old.id, old.titre, old.ville);
+        END;
+        CREATE TRIGGER IF NOT EXISTS logements_fts_au AFTER UPDATE OF titre, ville ON logements BEGIN
+            INSERT INTO logements_fts (logements_fts, rowid, titre, ville)
+            VALUES ('delete', old.id, old.titre, old.ville);
+            INSERT INTO logements_fts (rowid, titre, ville) VALUES (new.id, new.titre, new.ville);
+        END;
+    """)
+    if not fts_exists:
+        c.execute("INSERT INTO logements_fts (logements_fts) VALUES ('rebuild')")
+
+    # Compteur de génération, incrémenté à chaque commit du scraper
+    c.execute("CREATE TABLE IF NOT EXISTS meta (cle TEXT PRIMARY KEY, valeur INTEGER)")
+
+    # Statistiques de marché par groupe, tenues à jour par l'ingestion
+    from .stats import create_stats_table
+    create_stats_table(conn)
+
+    # Historique des prix et médianes par passage du scraper
+    from .history import create_history_tables
+    create_history_tables(conn)
+    from .alerts import create_alert_tables
+    create_alert_tables(conn)
+
     conn.commit()
+    # Statistiques des index pour le planificateur (sqlite_stat1), sur un
+    # échantillon : quelques millisecondes même sur des millions de lignes
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
     conn.close()
 
+def get_generation(conn):
+    row = conn.execute("SELECT valeur FROM meta WHERE cle = 'generation'").fetchone()
+    return row[0] if row else 0
+
+def bump_generation(conn):
+    # À appeler dans la transaction d'écriture, avant le commit
+    conn.execute("""
+        INSERT INTO meta (cle, valeur) VALUES ('generation', 1)
+        ON CONFLICT(cle) DO UPDATE SET valeur = valeur + 1
+    """)
+
 if __name__ == "__main__":
-    create_table()
\ No newline at end of file
+    create_table()
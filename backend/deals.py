@@ -0,0 +1,151 @@
+import numpy as np
+
+from .metrics import span
+
+DAY = 86400
+
+# Poids par défaut du score « bonne affaire » (modifiables par requête)
+WEIGHTS = {"prix": 1.0, "surface": 0.3, "fraicheur": 0.2}
+# Borne des poids acceptés par l'API (NaN et infinis refusés)
+MAX_WEIGHT = 100.0
+# Âge (jours) auquel le bonus de fraîcheur est divisé par deux
+HALF_LIFE_DAYS = 7
+# Pénalités (en écarts-types au carré) quand le type ou la ville diffèrent
+TYPE_PENALTY = 1.0
+VILLE_PENALTY = 4.0
+
+
+def _group_index(snapshot, column, lookup):
+    # Code de la colonne -> indice de la valeur normalisée, puis valeur par ligne
+    mapping = np.zeros(len(snapshot.values[column]), dtype=np.int64)
+    for index, codes in enumerate(lookup.values()):
+        mapping[codes] = index
+    return mapping[snapshot.codes[column]], len(lookup)
+
+
+def _group_medians(group, values):
+    # Médiane de values par groupe, sans boucle : tri par (groupe, valeur)
+    order = np.lexsort((values, group))
+    groups, starts, counts = np.unique(group[order], return_index=True, return_counts=True)
+    ordered = values[order]
+    medians = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+    result = np.zeros(group.max() + 1 if len(group) else 0)
+    result[groups] = medians
+    return result[group]
+
+
+class DealIndex:
+    """Score « bonne affaire » et plus proches voisins, précalculés sur un Snapshot.
+
+    Reconstruit à chaque génération ; une requête ne fait ensuite que des
+    opérations vectorisées sur les tableaux déjà prêts.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.generation = snapshot.generation
+        ville, _ = _group_index(snapshot, "ville", snapshot.ville_lookup)
+        type_bien, n_types = _group_index(snapshot, "type_bien", snapshot.type_lookup)
+        self.ville = ville
+        self.type_bien = type_bien
+        # Groupe (ville, type) : les types d'une même ville sont des groupes consécutifs
+        self.n_types = max(n_types, 1)
+        group = ville * self.n_types + type_bien
+
+        # Composantes du score, chacune de l'ordre de [-1, 1]
+        self.mediane_prix_m2 = _group_medians(group, snapshot.prix_m2)
+        self.decote = 1 - snapshot.prix_m2 / self.mediane_prix_m2
+        mediane_surface = _group_medians(group, snapshot.surface)
+        self.espace = np.clip(np.log2(snapshot.surface / mediane_surface), -1, 1)
+        # Âge compté depuis l'annonce la plus récente : décaler la référence
+        # multiplie tous les bonus par le même facteur, le classement ne change pas
+        reference = snapshot.premiere_vue.max() if snapshot.size else 0
+        age = np.maximum(reference - snapshot.premiere_vue, 0) / DAY
+        self.fraicheur = 0.5 ** (age / HALF_LIFE_DAYS)
+
+        # Voisins : log(prix, surface, prix_m2) centrés réduits, rangés par groupe
+        features = np.log(np.column_stack((snapshot.prix, snapshot.surface, snapshot.prix_m2)).astype(np.float64))
+        if snapshot.size:
+            std = features.std(axis=0)
+            features = (features - features.mean(axis=0)) / np.where(std > 0, std, 1)
+        self.by_group = np.argsort(group, kind="stable")
+        self.group_sorted = group[self.by_group]
+        self.features = np.ascontiguousarray(features[self.by_group])
+        self.position = np.empty(snapshot.size, dtype=np.int64)
+        self.position[self.by_group] = np.arange(snapshot.size)
+        # id -> ligne du snapshot
+        self.by_id = np.argsort(snapshot.id)
+
+    def score(self, idx, weights):
+        return (
+            weights["prix"] * self.decote[idx]
+            + weights["surface"] * self.espace[idx]
+            + weights["fraicheur"] * self.fraicheur[idx]
+        )
+
+    def top(self, k, weights=None, ville=None, surface_min=None, type_bien=None, prix_max=None):
+        """Les k meilleurs scores parmi les annonces filtrées, du meilleur au moins bon."""
+        weights = {**WEIGHTS, **(weights or {})}
+        snapshot = self.snapshot
+        with span("filtre"):
+            idx = np.flatnonzero(snapshot.mask(ville, surface_min, type_bien, prix_max))
+        with span("score"):
+            scores = self.score(idx, weights)
+            if k < len(idx):
+                # Sélection partielle en O(n), puis tri des k retenus seulement
+                keep = np.argpartition(-scores, k - 1)[:k]
+                idx, scores = idx[keep], scores[keep]
+            order = np.lexsort((snapshot.id[idx], -scores))
+            idx, scores = idx[order], scores[order]
+        with span("lignes"):
+            items = snapshot.rows(idx)
+        for item, i, score in zip(items, idx.tolist(), scores.tolist()):
+            item["score"] = round(score, 4)
+            item["decote"] = round(float(self.decote[i]), 4)
+            item["mediane_prix_m2"] = round(float(self.mediane_prix_m2[i]), 2)
+        return {"total": len(items), "poids": weights, "items": items}
+
+    def row(self, logement_id):
+        position = np.searchsorted(self.snapshot.id, logement_id, sorter=self.by_id)
+        if position < self.snapshot.size and self.snapshot.id[self.by_id[position]] == logement_id:
+            return int(self.by_id[position])
+        return None
+
+    def similar(self, logement_id, k):
+        """Les k annonces les plus proches ; None si l'annonce n'est pas servie."""
+        target = self.row(logement_id)
+        if target is None:
+            return None
+        ville, type_bien = self.ville[target], self.type_bien[target]
+        group = ville * self.n_types + type_bien
+        point = self.features[self.position[target]]
+
+        with span("voisins"):
+            # Candidats : même ville et type, puis même ville, puis tout ;
+            # on s'arrête au premier cercle qui contient assez d'annonces
+            size = len(self.group_sorted)
+            for lo_group, hi_group in ((group, group + 1),
+                                       (ville * self.n_types, (ville + 1) * self.n_types),
+                                       (None, None)):
+                if lo_group is None:
+                    lo, hi = 0, size
+                else:
+                    lo, hi = np.searchsorted(self.group_sorted, [lo_group, hi_group])
+                if hi - lo > k:
+                    break
+            rows = self.by_group[lo:hi]
+            distances = ((self.features[lo:hi] - point) ** 2).sum(axis=1)
+            distances += TYPE_PENALTY * (self.type_bien[rows] != type_bien)
+            distances += VILLE_PENALTY * (self.ville[rows] != ville)
+            distances[rows == target] = np.inf
+            count = min(k, len(rows) - 1)
+            if count <= 0:
+                keep = np.zeros(0, dtype=np.int64)
+            else:
+                keep = np.argpartition(distances, count - 1)[:count]
+            keep = keep[np.lexsort((self.snapshot.id[rows[keep]], distances[keep]))]
+
+        items = self.snapshot.rows(rows[keep])
+        for item, distance in zip(items, distances[keep].tolist()):
+            item["distance"] = round(float(np.sqrt(distance)), 4)
+        return {"id": logement_id, "items": items}
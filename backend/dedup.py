@@ -0,0 +1,221 @@
+import math
+import re
+import zlib
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .database import bump_generation, create_table, get_connection, normalize_ville
+
+# Signatures MinHash de 64 permutations découpées en 16 bandes de 4 lignes :
+# deux annonces deviennent candidates à partir d'une similarité ~0.5
+NUM_PERM = 64
+BANDS = 16
+# Similarité de Jaccard estimée minimale pour fusionner deux candidates
+THRESHOLD = 0.6
+# Largeur relative d'une tranche de prix (blocage)
+PRICE_BAND = 0.15
+# Au-delà, un membre de seau n'est comparé qu'aux MAX_BUCKET premiers
+MAX_BUCKET = 50
+# Jetons présents dans plus de 2 % des annonces ("meuble", "residence"...) :
+# ignorés, ils rapprocheraient des annonces différentes. Le plancher évite de
+# tout jeter sur un petit corpus, où 2 % ne fait qu'une ou deux annonces
+FREQUENT_SHARE = 0.02
+FREQUENT_MIN = 10
+# Les sites tronquent les titres (ImmoJeune à 39 caractères suivis de "...",
+# Studapart à 50) : seuls les TITLE_CHARS premiers caractères sont comparés
+TITLE_CHARS = 39
+# Écart relatif de surface toléré entre deux doublons
+SURFACE_TOLERANCE = 0.1
+
+MERSENNE = (1 << 31) - 1
+_rng = np.random.RandomState(42)
+_A = _rng.randint(1, MERSENNE, NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, MERSENNE, NUM_PERM).astype(np.uint64)
+_BAND_MIX = _rng.randint(1, MERSENNE, NUM_PERM // BANDS).astype(np.uint64)
+
+
+def title_words(titre):
+    # Mots du début du titre (minuscules, sans accents) ; le dernier mot d'un
+    # titre coupé est partiel ("Marse...") et n'est pas gardé
+    text = (titre or "").strip()
+    truncated = text.endswith(("...", "…"))
+    text = text.rstrip(".… ")
+    if len(text) > TITLE_CHARS:
+        text, truncated = text[:TITLE_CHARS], True
+    words = re.findall(r"\w+", normalize_ville(text) or "")
+    return words[:-1] if truncated and len(words) > 1 else words
+
+
+def shingles(titre):
+    # Mots et paires de mots du titre
+    words = title_words(titre)
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def url_shingles(url):
+    # Segments du chemin de l'url : slugs et identifiants propres à un site
+    return {"path:" + token for token in re.findall(r"[a-z0-9]+", urlsplit(url).path.lower())} if url else set()
+
+
+def host(url):
+    return urlsplit(url).netloc.lower().removeprefix("www.") if url else None
+
+
+def signature(tokens):
+    hashes = np.fromiter(
+        (zlib.crc32(token.encode("utf-8")) % MERSENNE for token in tokens),
+        dtype=np.uint64, count=len(tokens),
+    )
+    if not len(hashes):
+        return np.full(NUM_PERM, MERSENNE, dtype=np.uint64)
+    # (a * h + b) mod p pour les 64 permutations d'un coup ; a, h < 2^31
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % MERSENNE).min(axis=1)
+
+
+def price_bands(prix):
+    # Chaque annonce est rangée dans sa tranche et la suivante : deux prix
+    # voisins de part et d'autre d'une limite partagent toujours une tranche
+    if not prix or prix <= 0:
+        return (None,)
+    band = int(math.log(prix) / math.log(1 + PRICE_BAND))
+    return (band, band + 1)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def same_listing(a, b):
+    # Même url et titre différent : deux logements d'une même résidence
+    if a["url"] == b["url"]:
+        return False
+    if a["surface"] and b["surface"]:
+        return abs(a["surface"] - b["surface"]) <= SURFACE_TOLERANCE * max(a["surface"], b["surface"])
+    return True
+
+
+def similar(a, b, title_similarity):
+    # Entre deux sites, les urls n'ont rien en commun : le titre suffit. Sur un
+    # même site, les titres types ("Studio de 18m² meublé et équipé") désignent
+    # souvent des logements différents d'une résidence : l'url doit aussi
+    # se ressembler
+    if a["host"] != b["host"]:
+        return title_similarity >= THRESHOLD
+    tokens_a, tokens_b = a["tokens"] | a["url_tokens"], b["tokens"] | b["url_tokens"]
+    return jaccard(tokens_a, tokens_b) >= THRESHOLD
+
+
+def cluster(records):
+    """Regroupe les doublons : {id: cluster_id}, le représentant étant le moins cher.
+
+    Les records sont des dicts (id, titre, url, prix, surface, ville_norm,
+    type_bien_norm). Les signatures MinHash portent sur le titre ; seules les
+    annonces d'un même bloc (ville, type, tranche de prix) qui partagent une
+    bande LSH sont comparées, ce qui garde un coût quasi linéaire.
+    """
+    parent = {record["id"]: record["id"] for record in records}
+    by_id = {record["id"]: record for record in records}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    tokens = {record["id"]: shingles(record["titre"]) for record in records}
+    url_tokens = {record["id"]: url_shingles(record["url"]) for record in records}
+    frequency = Counter(token for values in (*tokens.values(), *url_tokens.values()) for token in values)
+    cutoff = max(FREQUENT_MIN, FREQUENT_SHARE * len(records))
+    frequent = {token for token, n in frequency.items() if n > cutoff}
+    features = {
+        record["id"]: {
+            "host": host(record["url"]),
+            "tokens": tokens[record["id"]] - frequent,
+            "url_tokens": url_tokens[record["id"]] - frequent,
+        }
+        for record in records
+    }
+    ids = list(tokens)
+    # Un titre fait seulement de jetons fréquents est signé sur tous les siens :
+    # deux ensembles vides auraient la même signature
+    matrix = (
+        np.stack([signature(features[id_]["tokens"] or tokens[id_]) for id_ in ids])
+        if ids else np.empty((0, NUM_PERM), dtype=np.uint64)
+    )
+    signatures = dict(zip(ids, matrix))
+    # Une clé entière par (annonce, bande), calculée d'un bloc sur toute la matrice
+    rows = NUM_PERM // BANDS
+    band_keys = (matrix.reshape(len(ids), BANDS, rows) * _BAND_MIX).sum(axis=2).tolist()
+
+    buckets = defaultdict(list)
+    for id_, keys in zip(ids, band_keys):
+        record = by_id[id_]
+        for band in price_bands(record["prix"]):
+            block = (record["ville_norm"], record["type_bien_norm"], band)
+            for b, key in enumerate(keys):
+                buckets[(block, b, key)].append(id_)
+
+    compared = set()
+    for members in buckets.values():
+        for i in range(1, len(members)):
+            a = members[i]
+            for b in members[:min(i, MAX_BUCKET)]:
+                pair = (a, b) if a < b else (b, a)
+                if pair in compared:
+                    continue
+                compared.add(pair)
+                root_a, root_b = find(a), find(b)
+                if root_a == root_b:
+                    continue
+                title_similarity = np.mean(signatures[a] == signatures[b])
+                if similar(features[a], features[b], title_similarity) and same_listing(by_id[a], by_id[b]):
+                    parent[root_a] = root_b
+
+    representatives = {}
+    for id_ in parent:
+        root = find(id_)
+        best = representatives.get(root)
+        if best is None or (by_id[id_]["prix"] or math.inf, id_) < (by_id[best]["prix"] or math.inf, best):
+            representatives[root] = id_
+    return {id_: representatives[find(id_)] for id_ in parent}
+
+
+def assign_clusters(conn=None):
+    """Recalcule cluster_id sur les annonces actives ; seules les lignes modifiées sont réécrites."""
+    own_conn = conn is None
+    conn = conn or get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        c = conn.execute("""
+            SELECT id, titre, url, prix, surface, ville_norm, type_bien_norm, cluster_id
+            FROM logements WHERE actif = 1
+        """)
+        columns = [d[0] for d in c.description]
+        records = [dict(zip(columns, row)) for row in c]
+
+        clusters = cluster(records)
+        changes = [
+            (clusters[record["id"]], record["id"])
+            for record in records if record["cluster_id"] != clusters[record["id"]]
+        ]
+        conn.executemany("UPDATE logements SET cluster_id = ? WHERE id = ?", changes)
+        if changes:
+            bump_generation(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+
+    representatives = len(set(clusters.values()))
+    return {"annonces": len(records), "groupes": representatives,
+            "doublons": len(records) - representatives, "modifiees": len(changes)}
+
+
+if __name__ == "__main__":
+    create_table()
+    print(assign_clusters())
@@ -0,0 +1,93 @@
+import json
+import zlib
+
+from .database import COLUMNS, get_connection
+from .queries import filter_clause
+
+NDJSON = "application/x-ndjson"
+ARROW = "application/vnd.apache.arrow.stream"
+BATCH_SIZE = 2000
+
+
+def iter_batches(batch_size=BATCH_SIZE, **filters):
+    # Curseur côté serveur : la table n'est jamais chargée en entier. La
+    # connexion peut passer d'un thread à l'autre (itération dans le threadpool)
+    conn = get_connection(check_same_thread=False)
+    try:
+        source, where, params = filter_clause(**filters)
+        c = conn.execute(
+            f"SELECT {', '.join(f'l.{column}' for column in COLUMNS)}" + source + where + " ORDER BY l.id",
+            params,
+        )
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def ndjson_chunks(batches):
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False, separators=(",", ":")) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+
+class _Chunks:
+    # Fichier minimal pour pyarrow : garde les octets écrits jusqu'au prochain drain()
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def arrow_chunks(batches):
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("titre", pa.string()), ("prix", pa.int64()),
+        ("surface", pa.float64()), ("prix_m2", pa.float64()), ("type_bien", pa.string()),
+        ("ville", pa.string()), ("site_source", pa.string()), ("image", pa.string()),
+        ("url", pa.string()), ("date_scraping", pa.string()),
+    ])
+    sink = _Chunks()
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,221 @@
+import argparse
+import time
+
+from .database import create_table, get_connection, normalize_type_bien, normalize_ville
+from .stats import load_stats, summarize
+
+DAY = 86400
+
+
+def create_history_tables(conn):
+    created = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historique_prix'"
+    ).fetchone()
+    conn.executescript("""
+        -- Un passage = une exécution du scraper (epoch de début)
+        CREATE TABLE IF NOT EXISTS passages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            epoch INTEGER NOT NULL,
+            compacte INTEGER NOT NULL DEFAULT 0
+        );
+        -- Une ligne par changement de prix seulement (prix NULL : annonce
+        -- retirée) : un prix inchangé d'un passage à l'autre ne coûte rien
+        CREATE TABLE IF NOT EXISTS historique_prix (
+            logement_id INTEGER NOT NULL,
+            epoch INTEGER NOT NULL,
+            passage_id INTEGER,
+            prix INTEGER,
+            PRIMARY KEY (logement_id, epoch)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_historique_passage ON historique_prix (passage_id);
+        -- Mesures du scraper par zone : durée, cartes vues, échecs de parsing
+        CREATE TABLE IF NOT EXISTS zones_passages (
+            passage_id INTEGER,
+            site TEXT,
+            ville TEXT,
+            debut INTEGER,
+            duree_s REAL,
+            cartes INTEGER,
+            annonces INTEGER,
+            echecs INTEGER,
+            erreur TEXT,
+            PRIMARY KEY (passage_id, site, ville)
+        );
+        -- Médianes par ville et type à chaque passage, lues dans les sketches de stats
+        CREATE TABLE IF NOT EXISTS tendances (
+            ville_norm TEXT,
+            type_bien_norm TEXT,
+            epoch INTEGER NOT NULL,
+            passage_id INTEGER,
+            ville TEXT,
+            type_bien TEXT,
+            n INTEGER,
+            mediane_prix REAL,
+            mediane_prix_m2 REAL,
+            PRIMARY KEY (ville_norm, type_bien_norm, epoch)
+        ) WITHOUT ROWID;
+    """)
+    if created:
+        # Point de départ : le prix actuel de chaque annonce, à sa dernière modification
+        conn.execute("""
+            INSERT OR IGNORE INTO historique_prix (logement_id, epoch, passage_id, prix)
+            SELECT id, COALESCE(maj, premiere_vue, 0), NULL, CASE WHEN actif = 1 THEN prix END
+            FROM logements
+        """)
+
+
+def start_run(conn, now):
+    return conn.execute("INSERT INTO passages (epoch) VALUES (?)", (now,)).lastrowid
+
+
+def record_prices(conn, run_id, now, observations):
+    # observations : (logement_id, prix ou None), déjà filtrées sur les changements
+    conn.executemany("""
+        INSERT OR REPLACE INTO historique_prix (logement_id, epoch, passage_id, prix) VALUES (?, ?, ?, ?)
+    """, [(id_, now, run_id, prix) for id_, prix in observations])
+
+
+def record_zones(run_id, reports, conn=None):
+    # Rapports de scraper.metrics.zone, enregistrés après l'ingestion du passage
+    own_conn = conn is None
+    conn = conn or get_connection()
+    try:
+        conn.executemany("""
+            INSERT OR REPLACE INTO zones_passages
+                (passage_id, site, ville, debut, duree_s, cartes, annonces, echecs, erreur)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (run_id, r["site"], r["ville"], r["debut"], r["duree_s"], r["cartes"], r["annonces"], r["echecs"], r["erreur"])
+            for r in reports
+        ])
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def last_zones(conn):
+    # Zones du dernier passage mesuré
+    c = conn.execute("""
+        SELECT passage_id, site, ville, debut, duree_s, cartes, annonces, echecs, erreur FROM zones_passages
+        WHERE passage_id = (SELECT MAX(passage_id) FROM zones_passages)
+        ORDER BY site, ville
+    """)
+    columns = [d[0] for d in c.description]
+    return [dict(zip(columns, row)) for row in c]
+
+
+def record_trends(conn, run_id, now):
+    # Les sketches viennent d'être mis à jour dans la même transaction
+    rows = []
+    for group in summarize(load_stats(conn), ["ville", "type_bien"]):
+        rows.append((
+            normalize_ville(group["ville"]), normalize_type_bien(group["type_bien"]), now, run_id,
+            group["ville"], group["type_bien"], group["prix"]["count"],
+            group["prix"].get("median"), group["prix_m2"].get("median"),
+        ))
+    conn.executemany("""
+        INSERT OR REPLACE INTO tendances
+            (ville_norm, type_bien_norm, epoch, passage_id, ville, type_bien, n, mediane_prix, mediane_prix_m2)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+
+def price_history(conn, logement_id):
+    return [
+        {"epoch": epoch, "prix": prix}
+        for epoch, prix in conn.execute(
+            "SELECT epoch, prix FROM historique_prix WHERE logement_id = ? ORDER BY epoch", (logement_id,)
+        )
+    ]
+
+
+def trends(conn, ville=None, type_bien=None, depuis=None, jusqua=None):
+    """Séries de médianes par (ville, type_bien), lues par plage de clé primaire."""
+    query = "SELECT ville, type_bien, epoch, n, mediane_prix, mediane_prix_m2 FROM tendances WHERE 1 = 1"
+    params = []
+    if ville:
+        query += " AND ville_norm = ?"
+        params.append(normalize_ville(ville))
+    if type_bien:
+        query += " AND type_bien_norm = ?"
+        params.append(normalize_type_bien(type_bien))
+    if depuis is not None:
+        query += " AND epoch >= ?"
+        params.append(depuis)
+    if jusqua is not None:
+        query += " AND epoch <= ?"
+        params.append(jusqua)
+    query += " ORDER BY ville_norm, type_bien_norm, epoch"
+
+    series = {}
+    for ville_, type_bien_, epoch, n, mediane_prix, mediane_prix_m2 in conn.execute(query, params):
+        serie = series.setdefault((ville_, type_bien_), {"ville": ville_, "type_bien": type_bien_, "points": []})
+        serie["points"].append({
+            "epoch": epoch, "n": n, "mediane_prix": mediane_prix, "mediane_prix_m2": mediane_prix_m2,
+        })
+    return list(series.values())
+
+
+def _thin(rows, step):
+    # rows triées par (clé, epoch) : garde le dernier point de chaque (clé,
+    # tranche de step secondes) et renvoie les (clé, epoch) à supprimer
+    drop = []
+    for i, (key, epoch) in enumerate(rows):
+        following = rows[i + 1] if i + 1 < len(rows) else None
+        if following and following[0] == key and following[1] // step == epoch // step:
+            drop.append((key, epoch))
+    return drop
+
+
+def compact(conn, before, step=7 * DAY):
+    """Ne garde, avant `before`, qu'un point par tranche de `step` secondes.
+
+    Le prix conservé est le dernier de la tranche, puis les prix répétés
+    consécutifs sont fusionnés ; les tendances sont réduites de la même façon.
+    Les passages concernés sont marqués compactés.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("""
+            SELECT logement_id, epoch FROM historique_prix WHERE epoch < ? ORDER BY logement_id, epoch
+        """, (before,)).fetchall()
+        drop = _thin(rows, step)
+        conn.executemany("DELETE FROM historique_prix WHERE logement_id = ? AND epoch = ?", drop)
+
+        repeated, previous = [], None
+        for logement_id, epoch, prix in conn.execute("""
+            SELECT logement_id, epoch, prix FROM historique_prix WHERE epoch < ? ORDER BY logement_id, epoch
+        """, (before,)):
+            if previous and previous[0] == logement_id and previous[1] == prix:
+                repeated.append((logement_id, epoch))
+            else:
+                previous = (logement_id, prix)
+        conn.executemany("DELETE FROM historique_prix WHERE logement_id = ? AND epoch = ?", repeated)
+
+        rows = conn.execute("""
+            SELECT ville_norm, type_bien_norm, epoch FROM tendances WHERE epoch < ?
+            ORDER BY ville_norm, type_bien_norm, epoch
+        """, (before,)).fetchall()
+        trend_drop = _thin([((v, t), epoch) for v, t, epoch in rows], step)
+        conn.executemany("""
+            DELETE FROM tendances WHERE ville_norm IS ? AND type_bien_norm IS ? AND epoch = ?
+        """, [key + (epoch,) for key, epoch in trend_drop])
+
+        conn.execute("UPDATE passages SET compacte = 1 WHERE epoch < ?", (before,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {"prix_supprimes": len(drop) + len(repeated), "tendances_supprimees": len(trend_drop)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compacte l'historique des prix des anciens passages")
+    parser.add_argument("--jours", type=int, default=90, help="historique complet conservé (jours)")
+    parser.add_argument("--pas", type=int, default=7, help="un point par tranche de N jours au-delà")
+    args = parser.parse_args()
+    create_table()
+    conn = get_connection()
+    print(compact(conn, int(time.time()) - args.jours * DAY, args.pas * DAY))
+    conn.close()
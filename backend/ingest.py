@@ -0,0 +1,130 @@
+import time
+
+from .database import (
+    SCRAPED_COLUMNS, bump_generation, content_hash, get_connection,
+    normalize_type_bien, normalize_ville,
+)
+from .alerts import record_alerts
+from .history import record_prices, record_trends, start_run
+from .stats import GROUP_COLUMNS, apply_deltas, counted
+
+
+def _select(conn, where, params):
+    c = conn.execute(f"""
+        SELECT id, url, titre, content_hash, actif, prix, surface, prix_m2, type_bien, ville, site_source
+        FROM logements WHERE {where}
+    """, params)
+    columns = [d[0] for d in c.description]
+    return [dict(zip(columns, row)) for row in c]
+
+
+def ingest(rows, conn=None, now=None, partial_zones=()):
+    """Publie les annonces d'un scraping en une seule transaction courte.
+
+    Les lignes sont des tuples dans l'ordre de SCRAPED_COLUMNS. Une annonce
+    est identifiée par (url, titre) : les nouvelles sont insérées, celles
+    dont l'empreinte a changé sont mises à jour, les autres ne sont pas
+    réécrites. Les annonces actives d'une zone (site, ville) scrapée mais
+    absentes de ce passage sont marquées inactives ; les zones sans aucune
+    ligne (échec du scraping) et les zones de `partial_zones` (lues en partie
+    seulement) ne retirent rien. Les statistiques par
+    groupe reçoivent uniquement le delta de ces changements. Le passage est
+    enregistré avec les changements de prix et les médianes par ville et type ;
+    les annonces nouvelles ou modifiées alimentent les alertes des recherches
+    enregistrées.
+    """
+    own_conn = conn is None
+    conn = conn or get_connection()
+    now = int(now or time.time())
+
+    # Dernière occurrence gagnante si une annonce apparaît deux fois dans le passage
+    scraped = {}
+    for row in rows:
+        record = dict(zip(SCRAPED_COLUMNS, row))
+        scraped[(record["url"], record["titre"])] = record
+    zones = {(r["site_source"], r["ville"]) for r in scraped.values()} - set(partial_zones)
+
+    stats = {"run_id": None, "inserted": [], "updated": [], "deactivated": [], "unchanged": 0, "alertes": 0}
+    try:
+        # BEGIN IMMEDIATE : verrou d'écriture pris d'emblée, la lecture de
+        # l'existant et les écritures voient le même état
+        conn.execute("BEGIN IMMEDIATE")
+
+        # Annonces déjà connues, cherchées par clé (url, titre) quelle que soit
+        # leur zone : une annonce peut passer d'une zone à l'autre
+        existing = {}
+        urls = sorted({url for url, _ in scraped})
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            for old in _select(conn, f"url IN ({', '.join('?' * len(chunk))})", chunk):
+                if (old["url"], old["titre"]) in scraped:
+                    existing[(old["url"], old["titre"])] = old
+
+        run_id = start_run(conn, now)
+        inserts, updates, deltas, prices = [], [], [], []
+
+        def delta(record, sign):
+            if counted(record):
+                group = {column: record[column] for column in GROUP_COLUMNS}
+                deltas.append((group, record["prix"], record["prix_m2"], sign))
+
+        for key, record in scraped.items():
+            hash_ = content_hash(*(record[c] for c in SCRAPED_COLUMNS if c != "date_scraping"))
+            current = existing.get(key)
+            values = [record[c] for c in SCRAPED_COLUMNS] + [
+                normalize_ville(record["ville"]), normalize_type_bien(record["type_bien"]), hash_,
+            ]
+            if current is None:
+                inserts.append(values + [now, now])
+                delta({**record, "actif": 1}, 1)
+            elif current["content_hash"] != hash_ or not current["actif"]:
+                updates.append(values + [now, current["id"]])
+                stats["updated"].append(current["id"])
+                if current["prix"] != record["prix"] or not current["actif"]:
+                    prices.append((current["id"], record["prix"]))
+                delta(current, -1)
+                delta({**record, "actif": 1}, 1)
+            else:
+                stats["unchanged"] += 1
+
+        # Retirées : annonces actives d'une zone scrapée, absentes de ce passage
+        missing = [
+            old for site, ville in zones
+            for old in _select(conn, "site_source = ? AND ville = ? AND actif = 1", (site, ville))
+            if (old["url"], old["titre"]) not in scraped
+        ]
+        for old in missing:
+            delta(old, -1)
+        missing = [old["id"] for old in missing]
+
+        columns = SCRAPED_COLUMNS + ["ville_norm", "type_bien_norm", "content_hash"]
+        for values in inserts:
+            cursor = conn.execute(f"""
+                INSERT INTO logements ({", ".join(columns)}, actif, premiere_vue, maj)
+                VALUES ({", ".join("?" * len(columns))}, 1, ?, ?)
+            """, values)
+            stats["inserted"].append(cursor.lastrowid)
+            prices.append((cursor.lastrowid, values[SCRAPED_COLUMNS.index("prix")]))
+        conn.executemany(f"""
+            UPDATE logements SET {", ".join(f"{c} = ?" for c in columns)}, actif = 1, maj = ?
+            WHERE id = ?
+        """, updates)
+        conn.executemany("UPDATE logements SET actif = 0, maj = ? WHERE id = ?", [(now, id_) for id_ in missing])
+        stats["deactivated"] = missing
+        apply_deltas(conn, deltas)
+        record_prices(conn, run_id, now, prices + [(id_, None) for id_ in missing])
+        record_trends(conn, run_id, now)
+        stats["alertes"] = record_alerts(conn, run_id, now, stats["inserted"] + stats["updated"])
+        stats["run_id"] = run_id
+
+        if inserts or updates or missing:
+            bump_generation(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if own_conn:
+            conn.close()
+
+    return stats
@@ -1,20 +1,454 @@
-from typing import Optional
-from fastapi import FastAPI, Query
-from backend.queries import get_logements
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from backend import alerts, deals, export, history, metrics, stats
+from backend.cache import GenerationClock, ResponseCache, etag_matches
+from backend.database import (
+    READ_POOL_SIZE, SORT_KEYS, create_table, get_connection, normalize_type_bien, normalize_ville,
+    read_connection, read_pool,
+)
+from backend import queries
+
+# LOGEMENTS_ENGINE=snapshot : recherche en mémoire (NumPy), rechargée après chaque scraping
+ENGINE = os.environ.get("LOGEMENTS_ENGINE", "sql")
+SNAPSHOT_REFRESH_S = float(os.environ.get("SNAPSHOT_REFRESH_S", "5"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+# PROFILE_SLOW_MS=500 : profil échantillonné des requêtes de plus de 500 ms (dans PROFILE_DIR)
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "0"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+# LOGEMENTS_MIGRATE=0 : schéma déjà migré avant le lancement des workers (run.sh)
+MIGRATE = os.environ.get("LOGEMENTS_MIGRATE", "1") == "1"
+
+engine = None
+profiler = None
+response_cache = ResponseCache(maxsize=RESPONSE_CACHE_SIZE)
+sql_generation = GenerationClock()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global engine, profiler
+    # Migre le schéma (colonnes normalisées + index) avant de servir
+    if MIGRATE:
+        create_table()
+    if ENGINE == "snapshot":
+        from backend.snapshot import SnapshotEngine
+        engine = SnapshotEngine(refresh_interval=SNAPSHOT_REFRESH_S)
+        engine.start()
+    warm_up()
+    # Executor de /logements/async : autant de threads que de connexions de
+    # lecture, créé à chaque démarrage (un lifespan arrêté ferme le sien)
+    app.state.query_executor = ThreadPoolExecutor(max_workers=READ_POOL_SIZE, thread_name_prefix="requetes")
+    if PROFILE_SLOW_MS > 0:
+        profiler = metrics.SlowRequestProfiler(PROFILE_SLOW_MS, directory=PROFILE_DIR)
+        profiler.start()
+    yield
+    if engine:
+        engine.stop()
+    if profiler:
+        profiler.stop()
+    app.state.query_executor.shutdown(wait=False)
+    read_pool().close()
+
+app = FastAPI(title="Student Housing API", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def timing(request: Request, call_next):
+    # Étapes chronométrées par metrics.span, renvoyées dans Server-Timing
+    timings, token = metrics.begin_request()
+    if profiler:
+        profiler.track(timings)
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.end_request(token)
+    duration = time.perf_counter() - timings.start
+
+    route = request.scope.get("route")
+    route = route.path if route else "inconnue"
+    metrics.REQUEST_SECONDS.observe(duration, route, request.method, str(response.status_code))
+    response.headers["Server-Timing"] = metrics.server_timing(timings, duration)
+    if profiler:
+        profiler.finish(timings, f"{request.method} {request.url.path}", duration)
+    return response
+
+
+def warm_up():
+    # Ouvre les connexions de lecture et charge en mémoire les pages des index
+    # avant la première requête ; chaque worker fait le sien
+    read_pool().warm_up([
+        "SELECT COUNT(*) FROM logements WHERE actif = 1 AND prix > 100 AND surface > 10 AND prix_m2 > 5",
+        "SELECT COUNT(*) FROM logements_fts",
+    ])
+    for sort in SORT_KEYS:
+        queries.get_logements(sort=sort, limit=50)
+    current_stats()
+
+
+def current_generation():
+    # Avec le snapshot, la génération est celle des données réellement servies
+    return engine.snapshot.generation if engine else sql_generation()
+
+
+def serialize(content):
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def compute_entry(key, compute):
+    content = compute()
+    with metrics.span("serialisation"):
+        return response_cache.put(key, serialize(content))
+
+
+def cached_response(key, compute, if_none_match):
+    # Corps JSON sérialisé une seule fois par clé (génération incluse), ETag fort
+    with metrics.span("cache"):
+        entry = response_cache.get(key)
+    if entry is None:
+        entry = compute_entry(key, compute)
+    return etag_response(entry, if_none_match)
+
+
+async def cached_response_async(executor, key, compute, if_none_match):
+    with metrics.span("cache"):
+        entry = response_cache.get(key)
+    if entry is None:
+        # Contexte copié : les étapes mesurées dans l'executor restent dans Server-Timing
+        context = contextvars.copy_context()
+        entry = await asyncio.get_running_loop().run_in_executor(
+            executor, context.run, compute_entry, key, compute,
+        )
+    return etag_response(entry, if_none_match)
+
+
+def etag_response(entry, if_none_match):
+    etag, body = entry
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(body, media_type="application/json", headers={"ETag": etag})
+
+
+def search_params(
+    ville: Optional[str] = None,
+    surface_min: Optional[float] = None,
+    type_bien: Optional[str] = None,
+    prix_max: Optional[int] = None,
+    q: Optional[str] = None,
+    sort: Optional[Literal["prix_m2", "prix", "surface", "date_scraping", "pertinence"]] = None,
+    order: Literal["asc", "desc"] = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    dedup: bool = False
+):
+    # Paramètres communs à /logements et /logements/async
+    return dict(
+        ville=ville, surface_min=surface_min, type_bien=type_bien, prix_max=prix_max, q=q,
+        sort=sort, order=order, limit=limit, cursor=cursor, dedup=dedup,
+    )
+
+
+def search(params, generation=None):
+    """Clé de cache et calcul d'une recherche /logements."""
+    # Clé normalisée : "Lyon", "lyon " et "LYON" partagent la même entrée
+    key = (
+        "logements",
+        current_generation() if generation is None else generation,
+        normalize_ville(params["ville"]) if params["ville"] else None,
+        params["surface_min"] or None,
+        normalize_type_bien(params["type_bien"]) if params["type_bien"] else None,
+        params["prix_max"] or None,
+        queries.fts_query(params["q"].lower()) if params["q"] else None,
+        params["sort"], params["order"], params["limit"], params["cursor"], params["dedup"],
+    )
+
+    def compute():
+        # La recherche plein texte (q=) et le regroupement des doublons
+        # (dedup=true) passent toujours par SQLite
+        use_engine = engine and not params["q"] and not params["dedup"]
+        get_logements = engine.get_logements if use_engine else queries.get_logements
+        try:
+            return get_logements(**params)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    return key, compute
 
-app = FastAPI(title="Student Housing API")
 
 @app.get("/logements")
-def logements(
+def logements(params: dict = Depends(search_params), if_none_match: Optional[str] = Header(None)):
+    key, compute = search(params)
+    return cached_response(key, compute, if_none_match)
+
+
+@app.get("/logements/async")
+async def logements_async(
+    request: Request, params: dict = Depends(search_params), if_none_match: Optional[str] = Header(None),
+):
+    # Même réponse que /logements ; un hit du cache est servi sans quitter la
+    # boucle, seul le calcul passe par l'executor borné
+    executor = request.app.state.query_executor
+    generation = engine.snapshot.generation if engine else sql_generation.peek()
+    if generation is None:
+        # Génération périmée : relue dans l'executor, jamais dans la boucle (la
+        # connexion du pool peut se faire attendre)
+        context = contextvars.copy_context()
+        generation = await asyncio.get_running_loop().run_in_executor(
+            executor, context.run, current_generation,
+        )
+    key, compute = search(params, generation)
+    return await cached_response_async(executor, key, compute, if_none_match)
+
+
+@app.get("/logements/export")
+def logements_export(
     ville: Optional[str] = None,
     surface_min: Optional[float] = None,
     type_bien: Optional[str] = None,
-    prix_max: Optional[int] = None
+    prix_max: Optional[int] = None,
+    format: Optional[Literal["ndjson", "arrow"]] = None,
+    gzip: bool = False,
+    accept: Optional[str] = Header(None)
 ):
-    df = get_logements(
-        ville=ville,
-        surface_min=surface_min,
-        type_bien=type_bien,
-        prix_max=prix_max
+    # Format choisi par ?format=, sinon par l'en-tête Accept (NDJSON par défaut)
+    if format is None:
+        format = "arrow" if accept and export.ARROW in accept else "ndjson"
+    if format == "arrow" and not export.arrow_available():
+        raise HTTPException(status_code=406, detail="Export Arrow indisponible (pyarrow non installé)")
+
+    batches = export.iter_batches(ville=ville, surface_min=surface_min, type_bien=type_bien, prix_max=prix_max)
+    if format == "arrow":
+        chunks, media_type = export.arrow_chunks(batches), export.ARROW
+    else:
+        chunks, media_type = export.ndjson_chunks(batches), export.NDJSON
+
+    headers = {}
+    if gzip:
+        chunks = export.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+# Sketches décodés de la dernière génération lue : (génération, {groupe: sketches})
+stats_groups = (None, {})
+
+def current_stats():
+    global stats_groups
+    generation = current_generation()
+    if stats_groups[0] != generation:
+        with metrics.span("sketches"):
+            with read_connection() as conn:
+                stats_groups = (generation, stats.load_stats(conn))
+    return stats_groups[1]
+
+
+@app.get("/stats")
+def market_stats(
+    ville: Optional[str] = None,
+    type_bien: Optional[str] = None,
+    site_source: Optional[str] = None,
+    group_by: list[Literal["ville", "type_bien", "site_source"]] = Query(["ville", "type_bien", "site_source"]),
+    if_none_match: Optional[str] = Header(None)
+):
+    # Dimensions hors group_by fusionnées : group_by=ville&group_by=type_bien
+    # donne les statistiques toutes sources confondues
+    group_by = [column for column in stats.GROUP_COLUMNS if column in group_by]
+    key = (
+        "stats",
+        current_generation(),
+        normalize_ville(ville) if ville else None,
+        normalize_type_bien(type_bien) if type_bien else None,
+        stats.NORMALIZERS["site_source"](site_source),
+        tuple(group_by),
     )
-    return df.to_dict(orient="records")
+    def compute():
+        groups = current_stats()
+        with metrics.span("resume"):
+            return stats.summarize(groups, group_by, ville=ville, type_bien=type_bien, site_source=site_source)
+
+    return cached_response(key, compute, if_none_match)
+
+
+# Index des bonnes affaires et des voisins, reconstruit à chaque génération
+deal_index = None
+deal_lock = threading.Lock()
+
+def current_deals():
+    # Construit à la première requête qui en a besoin, pas au démarrage :
+    # l'index couvre toute la table et chaque worker aurait le sien
+    global deal_index
+    generation = current_generation()
+    if deal_index is None or deal_index.generation != generation:
+        with deal_lock:
+            if deal_index is None or deal_index.generation != generation:
+                with metrics.span("index"):
+                    # Snapshot du moteur réutilisé s'il est à jour, sinon lu pour l'index seul
+                    if engine and engine.snapshot.generation == generation:
+                        snapshot = engine.snapshot
+                    else:
+                        from backend.snapshot import load_snapshot
+                        snapshot = load_snapshot()
+                    deal_index = deals.DealIndex(snapshot)
+    return deal_index
+
+
+@app.get("/logements/bonnes-affaires")
+def bonnes_affaires(
+    ville: Optional[str] = None,
+    surface_min: Optional[float] = None,
+    type_bien: Optional[str] = None,
+    prix_max: Optional[int] = None,
+    k: int = Query(20, ge=1, le=500),
+    poids_prix: float = Query(deals.WEIGHTS["prix"], ge=0, le=deals.MAX_WEIGHT),
+    poids_surface: float = Query(deals.WEIGHTS["surface"], ge=0, le=deals.MAX_WEIGHT),
+    poids_fraicheur: float = Query(deals.WEIGHTS["fraicheur"], ge=0, le=deals.MAX_WEIGHT),
+    if_none_match: Optional[str] = Header(None)
+):
+    # Score : décote du prix_m2 sur la médiane (ville, type), surface relative
+    # à la médiane et fraîcheur de l'annonce, pondérées par poids_*
+    weights = {"prix": poids_prix, "surface": poids_surface, "fraicheur": poids_fraicheur}
+    key = (
+        "bonnes-affaires",
+        current_generation(),
+        normalize_ville(ville) if ville else None,
+        surface_min or None,
+        normalize_type_bien(type_bien) if type_bien else None,
+        prix_max or None,
+        k, poids_prix, poids_surface, poids_fraicheur,
+    )
+    def compute():
+        return current_deals().top(
+            k, weights, ville=ville, surface_min=surface_min, type_bien=type_bien, prix_max=prix_max,
+        )
+
+    return cached_response(key, compute, if_none_match)
+
+
+@app.get("/logements/{logement_id}/similar")
+def logement_similaires(
+    logement_id: int,
+    k: int = Query(10, ge=1, le=100),
+    if_none_match: Optional[str] = Header(None)
+):
+    # Plus proches voisins en (prix, surface, prix_m2) normalisés, même ville et type d'abord
+    def compute():
+        result = current_deals().similar(logement_id, k)
+        if result is None:
+            raise HTTPException(status_code=404, detail="Logement inconnu")
+        return result
+
+    return cached_response(("similaires", current_generation(), logement_id, k), compute, if_none_match)
+
+
+@app.get("/logements/{logement_id}/historique")
+def logement_historique(logement_id: int):
+    with read_connection() as conn:
+        if not conn.execute("SELECT 1 FROM logements WHERE id = ?", (logement_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Logement inconnu")
+        # Un point par changement de prix (prix null : annonce retirée)
+        return {"id": logement_id, "historique": history.price_history(conn, logement_id)}
+
+
+@app.get("/tendances")
+def tendances(
+    ville: Optional[str] = None,
+    type_bien: Optional[str] = None,
+    depuis: Optional[int] = None,
+    jusqua: Optional[int] = None
+):
+    # Médianes de prix et prix_m2 à chaque passage du scraper, par ville et type
+    with read_connection() as conn:
+        return history.trends(conn, ville, type_bien, depuis, jusqua)
+
+
+class Recherche(BaseModel):
+    # Critères de get_logements ; un critère absent accepte toutes les valeurs
+    nom: Optional[str] = None
+    ville: Optional[str] = None
+    type_bien: Optional[str] = None
+    surface_min: Optional[float] = None
+    prix_max: Optional[int] = None
+
+
+@app.post("/recherches", status_code=201)
+def creer_recherche(recherche: Recherche):
+    # Les alertes arrivent avec les passages suivants du scraper
+    conn = get_connection()
+    try:
+        search_id = alerts.create_search(conn, **recherche.model_dump())
+    finally:
+        conn.close()
+    return {"id": search_id, **recherche.model_dump()}
+
+
+@app.get("/recherches")
+def recherches():
+    with read_connection() as conn:
+        return alerts.list_searches(conn)
+
+
+@app.delete("/recherches/{recherche_id}", status_code=204)
+def supprimer_recherche(recherche_id: int):
+    conn = get_connection()
+    try:
+        deleted = alerts.delete_search(conn, recherche_id)
+    finally:
+        conn.close()
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Recherche inconnue")
+    return Response(status_code=204)
+
+
+@app.get("/alertes")
+def alertes(
+    recherche_id: Optional[int] = None,
+    apres: int = 0,
+    limit: int = Query(100, ge=1, le=1000)
+):
+    # Lecture incrémentale : apres = id de la dernière alerte déjà lue
+    with read_connection() as conn:
+        return alerts.list_alerts(conn, recherche_id, apres, limit)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    # Format texte Prometheus : latences HTTP et par étape, cache, dernier passage du scraper
+    cache = response_cache.stats()
+    with read_connection() as conn:
+        zones = history.last_zones(conn)
+
+    def zone_labels(zone):
+        return {"site": zone["site"], "ville": zone["ville"]}
+
+    parts = [
+        metrics.REQUEST_SECONDS.render(),
+        metrics.STAGE_SECONDS.render(),
+        metrics.gauge("response_cache_hits_total", "Réponses servies par le cache", [({}, cache["hits"])], "counter"),
+        metrics.gauge("response_cache_misses_total", "Réponses calculées", [({}, cache["misses"])], "counter"),
+        metrics.gauge("scraper_zone_duration_seconds", "Durée du scraping de la zone au dernier passage",
+                      [(zone_labels(z), z["duree_s"] or 0) for z in zones]),
+        metrics.gauge("scraper_zone_cards", "Cartes trouvées dans la zone au dernier passage",
+                      [(zone_labels(z), z["cartes"]) for z in zones]),
+        metrics.gauge("scraper_zone_parse_failures", "Cartes non converties en annonce au dernier passage",
+                      [(zone_labels(z), z["echecs"]) for z in zones]),
+        metrics.gauge("scraper_zone_error", "1 si la zone a échoué au dernier passage",
+                      [(zone_labels(z), int(z["erreur"] is not None)) for z in zones]),
+    ]
+    if zones:
+        parts.append(metrics.gauge("scraper_last_run_timestamp_seconds", "Début du dernier passage mesuré",
+                                   [({}, min(z["debut"] for z in zones))]))
+    return "\n".join(parts) + "\n"
@@ -0,0 +1,183 @@
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Bornes (secondes) des histogrammes de latence
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Histogramme cumulatif au format Prometheus, par combinaison de labels."""
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            counts, total = self._series.get(label_values, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[label_values] = (counts, total + value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        for label_values, (counts, total) in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{{{','.join(labels + [le])}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def gauge(name, help, samples, kind="gauge"):
+    # samples : [(labels dict, valeur)] ; kind="counter" pour un total cumulé
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        rendered = ",".join(f'{key}="{_escape(v)}"' for key, v in labels.items())
+        lines.append(f"{name}{{{rendered}}} {value}" if rendered else f"{name} {value}")
+    return "\n".join(lines)
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP", ("route", "method", "status"),
+)
+STAGE_SECONDS = Histogram(
+    "logements_stage_duration_seconds", "Durée de chaque étape du traitement d'une requête", ("stage",),
+)
+
+
+class RequestTimings:
+    # Étapes mesurées pendant une requête, et threads qui l'ont servie (profilage)
+    def __init__(self):
+        self.spans = []
+        self.threads = set()
+        self.samples = Counter()
+        self.start = time.perf_counter()
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def span(name):
+    """Chronomètre une étape : histogramme global et en-tête Server-Timing de la requête."""
+    timings = _current.get()
+    if timings is not None:
+        timings.threads.add(threading.get_ident())
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        STAGE_SECONDS.observe(duration, name)
+        if timings is not None:
+            timings.spans.append((name, duration))
+
+
+def begin_request():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    return timings, token
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def server_timing(timings, total):
+    # Une entrée par étape (durées additionnées si l'étape se répète), plus le total
+    durations = {}
+    for name, duration in timings.spans:
+        durations[name] = durations.get(name, 0.0) + duration
+    parts = [f"{name};dur={duration * 1000:.2f}" for name, duration in durations.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class SlowRequestProfiler:
+    """Profileur par échantillonnage, activé par PROFILE_SLOW_MS.
+
+    Un seul thread relève toutes les `interval` secondes la pile des threads
+    qui servent une requête en cours ; si la requête dépasse le seuil, les
+    piles sont écrites au format « folded » (flamegraph.pl, speedscope).
+    """
+
+    def __init__(self, threshold_ms, interval_ms=5.0, directory="profiles"):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.directory = directory
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def track(self, timings):
+        with self._lock:
+            self._active.add(timings)
+
+    def finish(self, timings, label, duration):
+        # Le thread d'échantillonnage n'écrit que sous le verrou : une fois la
+        # requête retirée, ses échantillons ne bougent plus
+        with self._lock:
+            self._active.discard(timings)
+            samples = timings.samples.most_common()
+        if duration < self.threshold or not samples:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        safe = "".join(ch if ch.isalnum() else "_" for ch in label).strip("_")
+        path = os.path.join(self.directory, f"{int(time.time() * 1000)}_{safe}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in samples:
+                f.write(f"{stack} {count}\n")
+        print(f"Requête lente ({duration * 1000:.0f} ms) {label} : profil dans {path}")
+        return path
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for timings in self._active:
+                    for thread_id in list(timings.threads):
+                        frame = frames.get(thread_id)
+                        if frame is not None:
+                            timings.samples[_folded(frame)] += 1
+
+
+def _folded(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
@@ -1,53 +1,160 @@
-import pandas as pd
-from .database import get_connection
+import base64
+import json
+import math
+import re
 
-def normalize_type_bien(type_bien):
-    if not type_bien:
-        return None
+from .database import COLUMNS, SORT_KEYS, normalize_type_bien, normalize_ville, read_connection
+from .metrics import span
 
-    t = type_bien.strip().upper()
-    if "STUDIO" in t: return "STUDIO"
-    if "T1" in t: return "T1"
-    if "T2" in t: return "T2"
-    if "T3" in t: return "T3"
-    return t
+# Tri par score bm25, disponible uniquement avec une recherche q=
+RELEVANCE = "pertinence"
 
-def get_logements(ville=None, surface_min=None, type_bien=None, prix_max=None):
-    conn = get_connection()
-    c = conn.cursor()
 
-    query = "SELECT * FROM logements WHERE 1=1"
+def encode_cursor(sort, order, row):
+    # Curseur opaque : position (clé de tri, id) du dernier élément de la page
+    payload = json.dumps([sort, order, row[sort], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, sort, order):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise ValueError("Curseur invalide")
+    if (cursor_sort, cursor_order) != (sort, order) or not isinstance(last_id, int):
+        raise ValueError("Curseur incompatible avec le tri demandé")
+    # Valeur de la clé de tri : comparée telle quelle en SQL et dans le snapshot
+    if sort == "date_scraping":
+        valid = isinstance(value, str)
+    else:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+    if not valid:
+        raise ValueError("Curseur invalide")
+    return value, last_id
+
+def check_sort(sort, order, q=None):
+    if sort not in SORT_KEYS and not (sort == RELEVANCE and q):
+        raise ValueError(f"Tri inconnu : {sort}")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Ordre inconnu : {order}")
+
+def page(items, total, sort, order, limit):
+    # items contient au plus limit + 1 lignes : la dernière signale une page suivante
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(sort, order, items[-1])
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
+def fts_query(q):
+    # Chaque mot devient un préfixe entre guillemets : pas de syntaxe FTS5 côté utilisateur
+    words = re.findall(r"\w+", q or "")
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def filter_clause(ville=None, surface_min=None, type_bien=None, prix_max=None, match=None, dedup=False,
+                  sort=None):
+    # FROM + WHERE communs à la recherche et à l'export ; tables aliasées en l.
+    # Avec sort, les seuils des autres colonnes sont écrits +l.col : SQLite ne
+    # peut plus en faire une plage d'index et lit l'index de la clé de tri dans
+    # l'ordre, sans B-tree temporaire pour ORDER BY
+    def column(name):
+        return f"+l.{name}" if sort and name != sort else f"l.{name}"
+
+    source = " FROM logements l"
     params = []
+    if match:
+        source += " JOIN logements_fts ON logements_fts.rowid = l.id"
+
+    # Nettoyage directement en SQL
+    where = f" WHERE l.actif = 1 AND {column('prix')} > 100 AND {column('surface')} > 10 AND {column('prix_m2')} > 5"
+
+    if match:
+        where += " AND logements_fts MATCH ?"
+        params.append(match)
 
     if ville:
-        query += " AND ville LIKE ?"
-        params.append(f"%{ville}%")
+        where += " AND l.ville_norm = ?"
+        params.append(normalize_ville(ville))
 
     if surface_min:
-        query += " AND surface >= ?"
+        where += f" AND {column('surface')} >= ?"
         params.append(surface_min)
 
     if type_bien:
-        query += " AND type_bien = ?"
+        where += " AND l.type_bien_norm = ?"
         params.append(normalize_type_bien(type_bien))
 
     if prix_max:
-        query += " AND prix <= ?"
+        where += f" AND {column('prix')} <= ?"
         params.append(prix_max)
 
-    c.execute(query, params)
-    rows = c.fetchall()
-    conn.close()
+    # Un seul représentant par groupe de doublons (cluster_id NULL : pas encore groupée)
+    if dedup:
+        where += " AND COALESCE(l.cluster_id, l.id) = l.id"
+
+    return source, where, params
+
+
+def attach_variants(c, items):
+    # Autres annonces actives du groupe de chaque représentant, moins chères d'abord
+    by_id = {item["id"]: item for item in items}
+    for item in items:
+        item["variantes"] = []
+    if not by_id:
+        return
+    c.execute(f"""
+        SELECT cluster_id, id, titre, prix, surface, site_source, url FROM logements
+        WHERE actif = 1 AND cluster_id IN ({", ".join("?" * len(by_id))}) AND id != cluster_id
+        ORDER BY prix, id
+    """, list(by_id))
+    for cluster_id, *variant in c.fetchall():
+        by_id[cluster_id]["variantes"].append(dict(zip(["id", "titre", "prix", "surface", "site_source", "url"], variant)))
+
+
+def get_logements(ville=None, surface_min=None, type_bien=None, prix_max=None,
+                  sort=None, order="asc", limit=None, cursor=None, q=None, dedup=False):
+    match = fts_query(q)
+    sort = sort or (RELEVANCE if match else "prix_m2")
+    check_sort(sort, order, match)
+    after = decode_cursor(cursor, sort, order) if cursor else None
+
+    select = ", ".join(f"l.{column}" for column in COLUMNS)
+    if match:
+        select += ", bm25(logements_fts) AS pertinence"
+    # Comptage : toutes les plages restent utilisables ; page : index de la clé de tri
+    source, count_where, count_params = filter_clause(ville, surface_min, type_bien, prix_max, match, dedup)
+    _, where, params = filter_clause(ville, surface_min, type_bien, prix_max, match, dedup, sort=sort)
 
-    df = pd.DataFrame(rows, columns=[
-        "id", "titre", "prix", "surface", "prix_m2",
-        "type_bien", "ville", "site_source", "image", "url", "date_scraping"
-    ])
+    # Pagination par clé : on reprend juste après (clé, id) du curseur, ce qui
+    # coûte autant en page 100 qu'en page 1
+    sort_column = "bm25(logements_fts)" if sort == RELEVANCE else f"l.{sort}"
+    query = f"SELECT {select}" + source + where
+    if after:
+        query += f" AND ({sort_column}, l.id) {'>' if order == 'asc' else '<'} (?, ?)"
+        params.extend(after)
 
-    # Nettoyage
-    df = df[(df['prix'] > 100) & (df['surface'] > 10) & (df['prix_m2'] > 5)]
+    direction = "ASC" if order == "asc" else "DESC"
+    query += f" ORDER BY {sort_column} {direction}, l.id {direction}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit + 1)
 
-    # Tri intelligent
-    df = df.sort_values(by="prix_m2").reset_index(drop=True)
+    # Connexion du pool de lecture : requêtes préparées réutilisées d'un appel à l'autre
+    with read_connection() as conn:
+        c = conn.cursor()
+        # Total compté sur la première page seulement : le recompter à chaque
+        # page coûterait O(résultats) et annulerait la pagination par clé
+        total = None
+        if not after:
+            with span("comptage"):
+                total = c.execute("SELECT COUNT(*)" + source + count_where, count_params).fetchone()[0]
+        with span("sql"):
+            c.execute(query, params)
+            columns = [d[0] for d in c.description]
+            items = [dict(zip(columns, row)) for row in c.fetchall()]
+        if dedup:
+            with span("variantes"):
+                attach_variants(c, items)
 
-    return df
+    return page(items, total, sort, order, limit)
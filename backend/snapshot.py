@@ -0,0 +1,220 @@
+import threading
+
+import numpy as np
+
+from .database import COLUMNS, SORT_KEYS, get_connection, get_generation, normalize_type_bien, normalize_ville
+from .metrics import span
+from .queries import check_sort, decode_cursor, page
+
+# Colonnes texte gardées telles quelles (renvoyées mais jamais filtrées)
+TEXT_COLUMNS = ["titre", "image", "url", "date_scraping"]
+# Colonnes encodées par dictionnaire (code entier -> valeur)
+CODED_COLUMNS = ["type_bien", "ville", "site_source"]
+# Colonnes chargées : celles de l'API, plus la première apparition (fraîcheur, deals.py)
+SNAPSHOT_COLUMNS = COLUMNS + ["premiere_vue"]
+
+
+def _encode(values):
+    uniques = {}
+    codes = np.fromiter((uniques.setdefault(v, len(uniques)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(uniques)
+
+
+class Snapshot:
+    """Copie en mémoire de la table logements, en colonnes, déjà nettoyée et triée par (prix_m2, id)."""
+
+    def __init__(self, generation, rows):
+        self.generation = generation
+        columns = list(zip(*rows)) if rows else [()] * len(SNAPSHOT_COLUMNS)
+        data = dict(zip(SNAPSHOT_COLUMNS, columns))
+
+        self.size = len(rows)
+        self.id = np.array(data["id"], dtype=np.int64)
+        self.prix = np.array(data["prix"], dtype=np.int64)
+        self.surface = np.array(data["surface"], dtype=np.float64)
+        self.prix_m2 = np.array(data["prix_m2"], dtype=np.float64)
+        self.premiere_vue = np.array([v or 0 for v in data["premiere_vue"]], dtype=np.int64)
+
+        self.codes = {}
+        self.values = {}
+        for column in CODED_COLUMNS:
+            self.codes[column], self.values[column] = _encode(data[column])
+
+        self.text = {column: np.array(data[column], dtype=object) for column in TEXT_COLUMNS}
+
+        # Valeur normalisée -> codes correspondants (plusieurs graphies possibles)
+        self.ville_lookup = self._lookup("ville", normalize_ville)
+        self.type_lookup = self._lookup("type_bien", normalize_type_bien)
+
+        # date_scraping (texte ISO) remplacée par son rang pour trier et comparer
+        self.dates, self.date_rank = np.unique(
+            np.array(data["date_scraping"], dtype=str), return_inverse=True
+        )
+        self.sort_values = {
+            "prix_m2": self.prix_m2,
+            "prix": self.prix,
+            "surface": self.surface,
+            "date_scraping": self.date_rank,
+        }
+        # Permutation (clé, id) croissante pour chaque tri, calculée une fois par snapshot
+        self.orders = {key: np.lexsort((self.id, self.sort_values[key])) for key in SORT_KEYS}
+
+    def _lookup(self, column, normalize):
+        lookup = {}
+        for code, value in enumerate(self.values[column]):
+            lookup.setdefault(normalize(value), []).append(code)
+        return {key: np.array(codes, dtype=np.int32) for key, codes in lookup.items()}
+
+    def _match(self, column, codes):
+        if len(codes) == 1:
+            return self.codes[column] == codes[0]
+        return np.isin(self.codes[column], codes)
+
+    def mask(self, ville=None, surface_min=None, type_bien=None, prix_max=None):
+        mask = np.ones(self.size, dtype=bool)
+
+        if ville:
+            codes = self.ville_lookup.get(normalize_ville(ville))
+            if codes is None:
+                return np.zeros(self.size, dtype=bool)
+            mask &= self._match("ville", codes)
+
+        if surface_min:
+            mask &= self.surface >= surface_min
+
+        if type_bien:
+            codes = self.type_lookup.get(normalize_type_bien(type_bien))
+            if codes is None:
+                return np.zeros(self.size, dtype=bool)
+            mask &= self._match("type_bien", codes)
+
+        if prix_max:
+            mask &= self.prix <= prix_max
+
+        return mask
+
+    def after(self, sort, value, last_id):
+        """Masques des lignes après (value, last_id) dans l'ordre croissant, et de la ligne du curseur."""
+        column = self.sort_values[sort]
+        if sort == "date_scraping":
+            # Comparaison sur les rangs : la valeur du curseur n'est pas forcément dans ce snapshot
+            greater = column >= np.searchsorted(self.dates, value, side="right")
+            position = np.searchsorted(self.dates, value, side="left")
+            if position < len(self.dates) and self.dates[position] == value:
+                equal = column == position
+            else:
+                equal = np.zeros(self.size, dtype=bool)
+        else:
+            greater = column > value
+            equal = column == value
+        return greater | (equal & (self.id > last_id)), equal & (self.id == last_id)
+
+    def rows(self, idx):
+        columns = {
+            "id": self.id[idx].tolist(),
+            "prix": self.prix[idx].tolist(),
+            "surface": self.surface[idx].tolist(),
+            "prix_m2": self.prix_m2[idx].tolist(),
+        }
+        for column in CODED_COLUMNS:
+            values = self.values[column]
+            columns[column] = [values[code] for code in self.codes[column][idx].tolist()]
+        for column in TEXT_COLUMNS:
+            columns[column] = self.text[column][idx].tolist()
+
+        return [dict(zip(COLUMNS, row)) for row in zip(*(columns[c] for c in COLUMNS))]
+
+
+def load_snapshot():
+    conn = get_connection()
+    try:
+        # Génération et lignes lues dans la même transaction : pas de mélange
+        # entre deux exécutions du scraper
+        conn.execute("BEGIN")
+        generation = get_generation(conn)
+        rows = conn.execute(f"""
+            SELECT {", ".join(SNAPSHOT_COLUMNS)} FROM logements
+            WHERE actif = 1 AND prix > 100 AND surface > 10 AND prix_m2 > 5
+            ORDER BY prix_m2, id
+        """).fetchall()
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    return Snapshot(generation, rows)
+
+
+class SnapshotEngine:
+    """Répond à get_logements depuis un Snapshot, rechargé quand la génération change.
+
+    Le remplacement est une simple réaffectation d'attribut : un lecteur garde
+    la référence qu'il a prise et ne voit jamais une table à moitié chargée.
+    """
+
+    def __init__(self, refresh_interval=5.0):
+        self.refresh_interval = refresh_interval
+        self.snapshot = load_snapshot()
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current_generation(self):
+        conn = get_connection()
+        try:
+            return get_generation(conn)
+        finally:
+            conn.close()
+
+    def refresh(self):
+        with self._reload_lock:
+            if self.current_generation() == self.snapshot.generation:
+                return False
+            self.snapshot = load_snapshot()
+            return True
+
+    def _poll(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # On garde l'ancien snapshot si la base est momentanément illisible
+                print("Rechargement du snapshot impossible :", e)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._poll, name="snapshot-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def get_logements(self, ville=None, surface_min=None, type_bien=None, prix_max=None,
+                      sort=None, order="asc", limit=None, cursor=None, q=None, dedup=False):
+        if q:
+            raise ValueError("La recherche plein texte n'est pas disponible dans le snapshot")
+        if dedup:
+            raise ValueError("Le regroupement des doublons n'est pas disponible dans le snapshot")
+        sort = sort or "prix_m2"
+        check_sort(sort, order)
+        snapshot = self.snapshot
+        with span("filtre"):
+            mask = snapshot.mask(ville, surface_min, type_bien, prix_max)
+            # Comme en SQL, total sur la première page seulement
+            total = None if cursor else int(mask.sum())
+
+            if cursor:
+                greater, same = snapshot.after(sort, *decode_cursor(cursor, sort, order))
+                mask &= greater if order == "asc" else ~(greater | same)
+
+        with span("tri"):
+            ordering = snapshot.orders[sort]
+            if order == "desc":
+                ordering = ordering[::-1]
+            idx = ordering[mask[ordering]]
+            if limit is not None:
+                idx = idx[:limit + 1]
+
+        with span("lignes"):
+            rows = snapshot.rows(idx)
+        return page(rows, total, sort, order, limit)
@@ -0,0 +1,200 @@
+import bisect
+import itertools
+import json
+import math
+from collections import defaultdict
+
+from .database import normalize_type_bien, normalize_ville
+
+# Dimensions de regroupement de /stats
+GROUP_COLUMNS = ["ville", "type_bien", "site_source"]
+QUANTILES = {"p25": 0.25, "median": 0.5, "p75": 0.75, "p90": 0.9}
+NORMALIZERS = {
+    "ville": normalize_ville,
+    "type_bien": normalize_type_bien,
+    "site_source": lambda value: value.strip().lower() if value else None,
+}
+
+
+class QuantileSketch:
+    """Histogramme à buckets logarithmiques (à la DDSketch), erreur relative `alpha`.
+
+    Fusionnable (somme des buckets) et décrémentable : une annonce modifiée
+    ou retirée est simplement soustraite, sans relire les autres.
+    """
+
+    def __init__(self, alpha=0.01, buckets=None, count=0, total=0.0):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = defaultdict(int, buckets or {})
+        self.count = count
+        self.total = total
+
+    def _index(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, index):
+        # Milieu (relatif) du bucket : erreur relative <= alpha
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, value, n=1):
+        index = self._index(value)
+        self.buckets[index] += n
+        if self.buckets[index] <= 0:
+            del self.buckets[index]
+        self.count += n
+        self.total += n * value
+
+    def remove(self, value):
+        self.add(value, -1)
+
+    def merge(self, other):
+        for index, n in other.buckets.items():
+            self.buckets[index] += n
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    def quantiles(self, qs):
+        # Interpolation linéaire entre les deux rangs qui encadrent q × (n - 1),
+        # comme numpy.quantile : sur un petit groupe, p90 n'est pas ramené
+        # vers la médiane ou le minimum
+        if self.count <= 0:
+            return [None] * len(qs)
+        indexes = sorted(self.buckets)
+        cumulative = list(itertools.accumulate(self.buckets[index] for index in indexes))
+
+        def value_at(rank):
+            # Valeur de rang `rank` (0 = minimum) : premier bucket dont le cumul le dépasse
+            return self._value(indexes[bisect.bisect_right(cumulative, rank)])
+
+        results = []
+        for q in qs:
+            rank = q * (self.count - 1)
+            lower = math.floor(rank)
+            low = value_at(lower)
+            high = value_at(min(lower + 1, self.count - 1))
+            results.append(low + (rank - lower) * (high - low))
+        return results
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def summary(self):
+        if self.count <= 0:
+            return {"count": 0}
+        result = {
+            "count": self.count,
+            "min": self._value(min(self.buckets)),
+            "max": self._value(max(self.buckets)),
+            "mean": self.total / self.count,
+        }
+        result.update(zip(QUANTILES, self.quantiles(list(QUANTILES.values()))))
+        return {key: round(value, 2) if isinstance(value, float) else value for key, value in result.items()}
+
+    def dumps(self):
+        return json.dumps({"a": self.alpha, "n": self.count, "s": self.total, "b": self.buckets})
+
+    @classmethod
+    def loads(cls, data):
+        data = json.loads(data)
+        return cls(data["a"], {int(k): v for k, v in data["b"].items()}, data["n"], data["s"])
+
+
+def counted(record):
+    # Mêmes règles que /logements : annonce active qui passe le nettoyage
+    return bool(
+        record["actif"] and record["prix"] and record["surface"] and record["prix_m2"]
+        and record["prix"] > 100 and record["surface"] > 10 and record["prix_m2"] > 5
+    )
+
+
+def create_stats_table(conn):
+    created = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_groupes'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats_groupes (
+            ville TEXT,
+            type_bien TEXT,
+            site_source TEXT,
+            sketch_prix TEXT,
+            sketch_prix_m2 TEXT,
+            PRIMARY KEY (ville, type_bien, site_source)
+        )
+    """)
+    if created:
+        rebuild_stats(conn)
+
+
+def rebuild_stats(conn):
+    # Reconstruction complète (création de la table) ; ensuite tout est incrémental
+    deltas = [
+        (dict(zip(GROUP_COLUMNS, row[:3])), row[3], row[4], 1)
+        for row in conn.execute("""
+            SELECT ville, type_bien, site_source, prix, prix_m2 FROM logements
+            WHERE actif = 1 AND prix > 100 AND surface > 10 AND prix_m2 > 5
+        """)
+    ]
+    conn.execute("DELETE FROM stats_groupes")
+    apply_deltas(conn, deltas)
+
+
+def apply_deltas(conn, deltas):
+    """Applique des (groupe, prix, prix_m2, +1/-1) aux sketches, dans la transaction en cours."""
+    by_group = defaultdict(list)
+    for group, prix, prix_m2, sign in deltas:
+        by_group[tuple(group[column] for column in GROUP_COLUMNS)].append((prix, prix_m2, sign))
+
+    for key, changes in by_group.items():
+        row = conn.execute("""
+            SELECT sketch_prix, sketch_prix_m2 FROM stats_groupes
+            WHERE ville IS ? AND type_bien IS ? AND site_source IS ?
+        """, key).fetchone()
+        sketch_prix = QuantileSketch.loads(row[0]) if row else QuantileSketch()
+        sketch_prix_m2 = QuantileSketch.loads(row[1]) if row else QuantileSketch()
+        for prix, prix_m2, sign in changes:
+            sketch_prix.add(prix, sign)
+            sketch_prix_m2.add(prix_m2, sign)
+        if sketch_prix.count <= 0:
+            conn.execute("""
+                DELETE FROM stats_groupes WHERE ville IS ? AND type_bien IS ? AND site_source IS ?
+            """, key)
+            continue
+        conn.execute("""
+            INSERT OR REPLACE INTO stats_groupes (ville, type_bien, site_source, sketch_prix, sketch_prix_m2)
+            VALUES (?, ?, ?, ?, ?)
+        """, key + (sketch_prix.dumps(), sketch_prix_m2.dumps()))
+
+
+def load_stats(conn):
+    return {
+        tuple(row[:3]): (QuantileSketch.loads(row[3]), QuantileSketch.loads(row[4]))
+        for row in conn.execute(
+            "SELECT ville, type_bien, site_source, sketch_prix, sketch_prix_m2 FROM stats_groupes"
+        )
+    }
+
+
+def summarize(groups, group_by=GROUP_COLUMNS, **filters):
+    """Statistiques par groupe ; les dimensions absentes de group_by sont fusionnées."""
+    merged = {}
+    for key, (sketch_prix, sketch_prix_m2) in groups.items():
+        group = dict(zip(GROUP_COLUMNS, key))
+        if any(
+            value and NORMALIZERS[column](group[column]) != NORMALIZERS[column](value)
+            for column, value in filters.items()
+        ):
+            continue
+        out_key = tuple(group[column] for column in group_by)
+        if out_key not in merged:
+            merged[out_key] = (QuantileSketch(sketch_prix.alpha), QuantileSketch(sketch_prix_m2.alpha))
+        merged[out_key][0].merge(sketch_prix)
+        merged[out_key][1].merge(sketch_prix_m2)
+
+    return [
+        {**dict(zip(group_by, key)), "prix": prix.summary(), "prix_m2": prix_m2.summary()}
+        for key, (prix, prix_m2) in sorted(merged.items(), key=lambda item: tuple(v or "" for v in item[0]))
+        if prix.count > 0
+    ]
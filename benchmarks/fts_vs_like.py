@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from backend.database import get_connection
+from backend.queries import fts_query
+from benchmarks.generate import fill
+
+# Un terme fréquent et un terme rare (nom de résidence)
+TERMS = ["colocation", "cosydiem 42"]
+
+
+def timed(conn, query, params, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(query, params).fetchall()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations) * 1000, len(rows)
+
+
+def run(sizes, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            db_path = os.path.join(tmp, f"logements_{size}.db")
+            fill(db_path, size)
+            conn = get_connection(db_path)
+            for term in TERMS:
+                like_ms, like_rows = timed(conn, """
+                    SELECT id FROM logements
+                    WHERE titre LIKE ?
+                """, ["%" + "%".join(term.split()) + "%"], repeat)
+                fts_ms, fts_rows = timed(conn, """
+                    SELECT rowid FROM logements_fts
+                    WHERE logements_fts MATCH ? ORDER BY rank
+                """, [fts_query(term)], repeat)
+                results.append({
+                    "rows": size, "term": term,
+                    "like_ms": round(like_ms, 3), "fts_ms": round(fts_ms, 3),
+                    "like_hits": like_rows, "fts_hits": fts_rows,
+                })
+                print(json.dumps(results[-1]))
+            conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latence FTS5 (bm25) contre un scan LIKE")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
@@ -0,0 +1,117 @@
+import argparse
+import os
+import random
+import sqlite3
+from datetime import datetime
+
+from backend.database import (
+    DB_PATH, bump_generation, create_table, get_connection, normalize_type_bien, normalize_ville,
+)
+from backend.stats import rebuild_stats
+
+VILLES = ["Paris", "Marseille", "Lyon", "Bordeaux", "Lille", "Toulouse"]
+TYPES = ["STUDIO", "T1", "T2", "T3"]
+SITES = ["ImmoJeune", "Studapart"]
+QUALIFICATIFS = ["meublé et équipé", "en colocation", "avec balcon", "proche métro", "lumineux", "rénové"]
+RESIDENCES = ["Les Estudines", "Studéa", "Nexity Studéa", "Campus Vert", "Le Carré", "Cosydiem", "Néoresid"]
+
+
+def load_profile(db_path=DB_PATH):
+    # Annonces réelles servant de modèle : (ville, type_bien, site_source, prix, surface)
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return conn.execute("""
+            SELECT ville, type_bien, site_source, prix, surface FROM logements
+            WHERE ville IS NOT NULL AND type_bien IS NOT NULL AND prix > 0 AND surface > 0
+        """).fetchall()
+    finally:
+        conn.close()
+
+
+def generate_rows(n, seed=0, profile=None):
+    """Lignes synthétiques ; avec un profil, chaque ligne reprend la ville, le
+    type et la source d'une annonce réelle tirée au hasard, avec prix et
+    surface perturbés de ±10 % (mêmes distributions, lignes sales comprises)."""
+    rng = random.Random(seed)
+    date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for i in range(n):
+        if profile:
+            ville, type_bien, site, prix, surface = rng.choice(profile)
+            surface = round(surface * rng.uniform(0.9, 1.1), 1)
+            prix = int(prix * rng.uniform(0.9, 1.1))
+        else:
+            ville, type_bien, site = rng.choice(VILLES), rng.choice(TYPES), rng.choice(SITES)
+            surface = round(rng.uniform(12, 70), 1)
+            prix = int(surface * rng.uniform(15, 45))
+        titre = f"{type_bien.capitalize()} de {surface:g}m² {rng.choice(QUALIFICATIFS)} ({rng.choice(RESIDENCES)} {i % 997})"
+        yield (
+            titre, prix, surface, round(prix / surface, 2), type_bien, ville,
+            site, None, f"https://example.org/annonce/{i}", date,
+            normalize_ville(ville), normalize_type_bien(type_bien),
+        )
+
+
+# Réglages du chargement seulement : pas de fsync (une base de benchmark se
+# régénère) et 256 Mo de cache de pages
+LOAD_PRAGMAS = ["PRAGMA synchronous = OFF", "PRAGMA cache_size = -262144", "PRAGMA temp_store = MEMORY"]
+FTS_TRIGGERS = ["logements_fts_ai", "logements_fts_ad", "logements_fts_au"]
+
+
+def drop_secondary(conn):
+    # Index secondaires, table FTS et ses triggers retirés pendant le chargement :
+    # chaque ligne insérée ne met plus à jour 17 index et l'index plein texte.
+    # create_table les recrée ensuite en un passage trié par index
+    names = [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'logements' AND sql IS NOT NULL"
+    )]
+    for name in names:
+        conn.execute(f"DROP INDEX {name}")
+    for name in FTS_TRIGGERS:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute("DROP TABLE IF EXISTS logements_fts")
+    conn.commit()
+
+
+def fill(db_path, n, seed=0, batch=50_000, profile=None):
+    # Sans profil explicite, la base de l'application sert de modèle si elle existe
+    if profile is None:
+        profile = load_profile()
+    create_table(db_path)
+    conn = get_connection(db_path)
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+    drop_secondary(conn)
+    rows = generate_rows(n, seed, profile)
+    while True:
+        chunk = [row for _, row in zip(range(batch), rows)]
+        if not chunk:
+            break
+        conn.executemany("""
+            INSERT INTO logements (titre, prix, surface, prix_m2, type_bien, ville, site_source, image, url,
+                                   date_scraping, ville_norm, type_bien_norm)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, chunk)
+        # Un commit par lot : le WAL reste borné même à 10M lignes
+        conn.commit()
+    conn.close()
+
+    # Index, FTS (rebuild), empreintes et ANALYZE recréés d'un bloc
+    create_table(db_path)
+    conn = get_connection(db_path)
+    rebuild_stats(conn)
+    bump_generation(conn)
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remplit une base logements synthétique (10k à 10M lignes)")
+    parser.add_argument("db_path")
+    parser.add_argument("-n", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--profil", default=DB_PATH, help="base réelle dont on reprend les distributions")
+    parser.add_argument("--uniforme", action="store_true", help="distributions uniformes, sans profil")
+    args = parser.parse_args()
+    fill(args.db_path, args.n, args.seed, profile=[] if args.uniforme else load_profile(args.profil))
@@ -0,0 +1,118 @@
+import argparse
+import random
+import socket
+import threading
+import time
+from collections import Counter
+
+import requests
+
+from benchmarks.generate import TYPES, VILLES
+from benchmarks.timing import emit, percentiles, write_report
+
+# Scénarios : une fonction rng -> (chemin, paramètres)
+SCENARIOS = {
+    "liste": lambda rng: ("/logements", {"limit": 50}),
+    "filtres": lambda rng: ("/logements", {
+        "ville": rng.choice(VILLES), "type_bien": rng.choice(TYPES),
+        "prix_max": rng.choice([600, 800, 1000, 1500]), "limit": 50,
+    }),
+    "tri": lambda rng: ("/logements", {
+        "ville": rng.choice(VILLES), "sort": rng.choice(["prix", "surface", "date_scraping"]),
+        "order": rng.choice(["asc", "desc"]), "limit": 50,
+    }),
+    "recherche": lambda rng: ("/logements", {"q": rng.choice(["meublé", "colocation", "balcon métro"]), "limit": 20}),
+    "stats": lambda rng: ("/stats", {"group_by": ["ville", "type_bien"]}),
+}
+
+
+def serve(db_path=None):
+    """Lance l'API dans un thread sur un port libre ; renvoie (url, server)."""
+    import uvicorn
+
+    from backend import database
+    if db_path:
+        database.DB_PATH = db_path
+    from backend.main import app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def run_scenario(base_url, name, duration, concurrency, seed=0):
+    make_request = SCENARIOS[name]
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        local, local_statuses = [], Counter()
+        while time.perf_counter() < deadline:
+            path, params = make_request(rng)
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + path, params=params, timeout=30)
+                response.content
+                local_statuses[response.status_code] += 1
+            except requests.RequestException:
+                local_statuses["erreur"] += 1
+                continue
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+            statuses.update(local_statuses)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        **{f"{key}_ms": round(value, 3) if value is not None else None
+           for key, value in percentiles(latencies).items()},
+        "statuses": {str(status): n for status, n in sorted(statuses.items(), key=str)},
+    }
+    return emit(result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Charge HTTP sur l'API : latences p50/p95/p99 et requêtes/s")
+    parser.add_argument("--url", help="API déjà lancée (sinon l'API est démarrée dans le processus)")
+    parser.add_argument("--db", help="base servie par l'API démarrée dans le processus")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10.0, help="secondes par scénario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=float, default=1.0)
+    parser.add_argument("--output", help="fichier JSON du rapport")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        base_url, server = serve(args.db)
+    try:
+        results = []
+        for name in args.scenarios:
+            if args.warmup:
+                run_scenario(base_url, name, args.warmup, args.concurrency, seed=-1)
+            results.append(run_scenario(base_url, name, args.duration, args.concurrency))
+    finally:
+        if server:
+            server.should_exit = True
+    if args.output:
+        write_report(args.output, "load", results, url=args.url, db=args.db,
+                     duration=args.duration, concurrency=args.concurrency)
@@ -0,0 +1,105 @@
+import argparse
+import os
+import tempfile
+
+from backend import database, queries
+from benchmarks.generate import fill
+from benchmarks.timing import emit, measure, write_report
+from scraper.parsing import extract_prix, extract_surface, normalize_type
+
+SURFACE_TEXTS = ["Studio de 18 à 26m² meublé et équipé", "T2 de 41m2", "Appartement 32,5 m²", "Colocation"]
+TYPE_TEXTS = ["Studio", "T1 bis", "t2 duplex", "Chambre"]
+PRIX_TEXTS = ["À partir de 1 090 € / mois", "695€ CC", "Prix sur demande"]
+
+# (nom, paramètres de get_logements)
+QUERIES = [
+    ("premiere_page", {"limit": 50}),
+    ("ville_type", {"ville": "Paris", "type_bien": "STUDIO", "limit": 50}),
+    ("filtres_complets", {"ville": "Lyon", "type_bien": "T1", "surface_min": 20, "prix_max": 900, "limit": 50}),
+    ("tri_prix_desc", {"sort": "prix", "order": "desc", "limit": 50}),
+    ("plein_texte", {"q": "meublé", "limit": 50}),
+    ("doublons", {"dedup": True, "limit": 50}),
+]
+
+
+def parsing_benchmarks(repeat):
+    results = []
+    for name, fn, texts in (
+        ("extract_surface", extract_surface, SURFACE_TEXTS),
+        ("normalize_type", normalize_type, TYPE_TEXTS),
+        ("extract_prix", extract_prix, PRIX_TEXTS),
+    ):
+        # Un appel = tous les textes d'exemple, ramené ensuite à un texte
+        result = measure(lambda: [fn(text) for text in texts], repeat)
+        result["median_us"] = round(result["median_us"] / len(texts), 3)
+        result["min_us"] = round(result["min_us"] / len(texts), 3)
+        result["ops_s"] = round(result["ops_s"] * len(texts), 1)
+        results.append(emit({"bench": f"parsing.{name}", **result}))
+    return results
+
+
+def query_benchmarks(repeat, rows):
+    results = []
+    for name, params in QUERIES:
+        result = measure(lambda: queries.get_logements(**params), repeat)
+        results.append(emit({"bench": f"queries.get_logements.{name}", "rows": rows, **result}))
+
+    # Page suivante : coût d'un curseur au milieu du résultat
+    cursor = queries.get_logements(limit=rows // 2)["next_cursor"]
+    if cursor:
+        result = measure(lambda: queries.get_logements(limit=50, cursor=cursor), repeat)
+        results.append(emit({"bench": "queries.get_logements.curseur_milieu", "rows": rows, **result}))
+
+    result = measure(lambda: queries.filter_clause("Paris", 20, "T1", 900), repeat)
+    results.append(emit({"bench": "queries.filter_clause", **result}))
+    result = measure(lambda: queries.decode_cursor(cursor, "prix_m2", "asc"), repeat) if cursor else None
+    if result:
+        results.append(emit({"bench": "queries.decode_cursor", **result}))
+
+    from backend.snapshot import SnapshotEngine
+    engine = SnapshotEngine()
+    for name, params in QUERIES:
+        if "q" in params or "dedup" in params:
+            continue
+        result = measure(lambda: engine.get_logements(**params), repeat)
+        results.append(emit({"bench": f"snapshot.get_logements.{name}", "rows": rows, **result}))
+
+    from backend.deals import DealIndex
+    result = measure(lambda: DealIndex(engine.snapshot), 1)
+    results.append(emit({"bench": "deals.index", "rows": rows, **result}))
+    deals = DealIndex(engine.snapshot)
+    for name, params in (("top", {}), ("top_ville_type", {"ville": "Lyon", "type_bien": "T2"})):
+        result = measure(lambda: deals.top(20, **params), repeat)
+        results.append(emit({"bench": f"deals.{name}", "rows": rows, **result}))
+    if engine.snapshot.size:
+        logement_id = int(engine.snapshot.id[engine.snapshot.size // 2])
+        result = measure(lambda: deals.similar(logement_id, 10), repeat)
+        results.append(emit({"bench": "deals.similar", "rows": rows, **result}))
+    return results
+
+
+def run(rows, db_path, repeat):
+    results = parsing_benchmarks(repeat)
+    with tempfile.TemporaryDirectory() as tmp:
+        if db_path is None:
+            db_path = os.path.join(tmp, "logements.db")
+            fill(db_path, rows)
+        # Les fonctions de requête lisent la base désignée par database.DB_PATH
+        database.DB_PATH = db_path
+        conn = database.get_connection(db_path)
+        rows = conn.execute("SELECT COUNT(*) FROM logements").fetchone()[0]
+        conn.close()
+        results += query_benchmarks(repeat, rows)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de la couche requêtes et du parsing")
+    parser.add_argument("--rows", type=int, default=100_000, help="taille de la base générée")
+    parser.add_argument("--db", help="base existante à mesurer (sinon une base synthétique est générée)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="fichier JSON du rapport")
+    args = parser.parse_args()
+    results = run(args.rows, args.db, args.repeat)
+    if args.output:
+        write_report(args.output, "micro", results, rows=args.rows, db=args.db, repeat=args.repeat)
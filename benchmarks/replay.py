@@ -0,0 +1,50 @@
+import argparse
+import os
+
+from lxml import html as lxml_html
+
+from benchmarks.timing import emit, measure, write_report
+from scraper.parsing import parse_cards
+from scraper.sources import ADAPTERS, FIXTURES_DIR, FixtureStore
+
+
+def replay(directory, repeat):
+    """Rejoue le parsing des pages enregistrées (SCRAPER_FIXTURES=record), par étape."""
+    store = FixtureStore(directory, mode="replay")
+    results = []
+    for adapter_class in ADAPTERS:
+        adapter = adapter_class(fixtures=store)
+        for url, ville in adapter.zones:
+            if not os.path.exists(store.path(adapter.site, url)):
+                continue
+            page = store.load(adapter.site, url)
+
+            def parse_tree():
+                tree = lxml_html.fromstring(page)
+                tree.make_links_absolute(url)
+                return tree
+
+            tree = parse_tree()
+            cards = adapter.extract_cards(tree)
+            base = {"site": adapter.site, "ville": ville, "octets": len(page), "cartes": len(cards)}
+            for step, fn in (
+                ("lxml", parse_tree),
+                ("extract_cards", lambda: adapter.extract_cards(tree)),
+                ("parse_cards", lambda: parse_cards(cards, adapter.parse_card, ville)),
+                ("parse_page", lambda: adapter.parse_page(page, url, ville)),
+            ):
+                results.append(emit({"bench": f"replay.{step}", **base, **measure(fn, repeat)}))
+    if not results:
+        print(f"Aucune page enregistrée dans {directory} : lancer le scraper avec SCRAPER_FIXTURES=record")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark du parsing sur les pages HTML enregistrées")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="fichier JSON du rapport")
+    args = parser.parse_args()
+    results = replay(args.fixtures, args.repeat)
+    if args.output:
+        write_report(args.output, "replay", results, fixtures=args.fixtures, repeat=args.repeat)
@@ -0,0 +1,63 @@
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+
+
+def measure(fn, repeat=5, number=None, budget=0.05):
+    """Temps par appel de fn() : médiane et minimum sur `repeat` séries.
+
+    Sans `number`, le nombre d'appels par série est calibré pour qu'une série
+    dure au moins `budget` secondes.
+    """
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= budget or number >= 1_000_000:
+                break
+            number *= 10
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    median = statistics.median(samples)
+    return {
+        "calls": number * repeat,
+        "median_us": round(median * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+        "ops_s": round(1 / median, 1) if median else None,
+    }
+
+
+def percentiles(values, qs=(50, 95, 99)):
+    # Rang le plus proche, sur des valeurs déjà mesurées
+    if not values:
+        return {f"p{q}": None for q in qs}
+    ordered = sorted(values)
+    return {f"p{q}": ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))] for q in qs}
+
+
+def emit(result):
+    print(json.dumps(result, ensure_ascii=False))
+    return result
+
+
+def write_report(path, benchmark, results, **params):
+    # Un fichier JSON par exécution, comparable d'une exécution à l'autre
+    report = {
+        "benchmark": benchmark,
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params,
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
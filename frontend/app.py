@@ -1,23 +1,64 @@
+import html
+import os
 import streamlit as st
 import requests
-import pandas as pd
+from requests.adapters import HTTPAdapter
 
 # =====================
 # 🔹 FASTAPI CONFIG
 # =====================
-# 🔹 FASTAPI CONFIG
-API_URL = "http://backend:8000/logements"
+API_URL = os.environ.get("API_URL", "http://backend:8000/logements")
+PAGE_SIZE = 30          # annonces par lot affiché
+CACHE_TTL = 60          # secondes avant de redemander un même lot à l'API
+
+
+@st.cache_resource
+def get_session():
+    # Session keep-alive partagée par toutes les exécutions du script
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
 
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_page(params, cursor=None):
+    # params : tuple trié de (clé, valeur) pour servir de clé de cache
+    query = {key: value for key, value in params if value is not None}
+    query.update(sort="prix", order="asc", limit=PAGE_SIZE)
+    if cursor:
+        query["cursor"] = cursor
+    r = get_session().get(API_URL, params=query, timeout=10)
+    r.raise_for_status()
+    return r.json()
 
-def fetch_logements(params):
+
+def fetch_logements(params, cursor=None):
     try:
-        r = requests.get(API_URL, params=params, timeout=10)
-        r.raise_for_status()
-        return pd.DataFrame(r.json())
+        return fetch_page(tuple(sorted(params.items())), cursor)
     except Exception as e:
         st.error("❌ Impossible de récupérer les données depuis l’API")
         st.stop()
 
+
+def render_cards(items):
+    # Un seul bloc HTML par lot, images chargées à l'affichage
+    cards = []
+    for row in items:
+        e = {key: html.escape(str(value)) if value is not None else "" for key, value in row.items()}
+        image = f'<img src="{e["image"]}" loading="lazy" alt="">' if row.get("image") else ""
+        cards.append(f"""
+        <div class="card">
+            {image}
+            <span class="badge {e['type_bien']}">{e['type_bien']}</span>
+            <div class="price">{e['prix']} €</div>
+            <div class="m2">{e['surface']} m² • {e['prix_m2']} €/m²</div>
+            <div class="city">📍 {e['ville']}</div>
+            <div class="source">{e['site_source']}</div>
+            <a class="button" href="{e['url']}" target="_blank">Voir l'annonce</a>
+        </div>""")
+    st.markdown(f'<div class="grid">{"".join(cards)}</div>', unsafe_allow_html=True)
+
 # =====================
 # 🎨 STREAMLIT CONFIG
 # =====================
@@ -29,6 +70,9 @@ st.set_page_config(page_title="Student Housing Finder", layout="wide")
 st.markdown("""
 <style>
 body { background: #f2f2f2; }
+.grid { display: grid; grid-template-columns: repeat(3, 1fr); gap: 20px; margin-bottom: 20px; }
+@media (max-width: 900px) { .grid { grid-template-columns: 1fr; } }
+.card img { width: 100%; height: 160px; object-fit: cover; border-radius: 10px; margin-bottom: 8px; }
 .card {
     background: white;
     border-radius: 15px;
@@ -91,6 +135,8 @@ if st.session_state.page == 1:
             "surface_min": surface_min if surface_min > 0 else None,
             "prix_max": prix_max if prix_max > 0 else None
         }
+        # Curseur de chaque lot affiché : None pour le premier
+        st.session_state.cursors = [None]
         st.session_state.page = 2
         st.rerun()
 
@@ -99,30 +145,24 @@ if st.session_state.page == 1:
 # =====================
 if st.session_state.page == 2:
     params = st.session_state.search_params
-    df = fetch_logements(params)
+    first = fetch_logements(params)
 
     st.title("🏠 Best offers for you")
-    st.caption(f"{len(df)} logements trouvés")
+    st.caption(f"{first['total']} logements trouvés")
 
-    if df.empty:
+    if not first["items"]:
         st.warning("Aucun logement trouvé pour ces critères.")
     else:
-        df = df.sort_values(by="prix")
-
-        cols = st.columns(3)
-        for i, row in df.iterrows():
-            col = cols[i % 3]
-            with col:
-                st.markdown(f"""
-                <div class="card">
-                    <span class="badge {row['type_bien']}">{row['type_bien']}</span>
-                    <div class="price">{row['prix']} €</div>
-                    <div class="m2">{row['surface']} m² • {row['prix_m2']} €/m²</div>
-                    <div class="city">📍 {row['ville']}</div>
-                    <div class="source">{row['site_source']}</div>
-                    <a class="button" href="{row['url']}" target="_blank">Voir l'annonce</a>
-                </div>
-                """, unsafe_allow_html=True)
+        # Lots déjà affichés (servis par le cache), puis bouton pour le suivant
+        data = first
+        for cursor in st.session_state.cursors:
+            data = fetch_logements(params, cursor) if cursor else first
+            render_cards(data["items"])
+
+        if data["next_cursor"]:
+            if st.button(f"Afficher plus ({PAGE_SIZE} suivants)"):
+                st.session_state.cursors.append(data["next_cursor"])
+                st.rerun()
 
     if st.button("🔙 Nouvelle recherche"):
         st.session_state.page = 1
@@ -14,13 +14,24 @@ if ! python3 -c "import streamlit" 2>/dev/null; then
     pip3 install streamlit --user
 fi
 
+# Backend workers: one process per core by default (WEB_CONCURRENCY to override).
+# The schema is migrated once here, then each worker opens its own read-only
+# connection pool (READ_POOL_SIZE) and warms it up before accepting requests.
+WORKERS=${WEB_CONCURRENCY:-$(nproc 2>/dev/null || echo 2)}
+echo "  → Migrating database schema..."
+python3 -m backend.database || exit 1
+
 # Start backend in background
-echo "  → Starting FastAPI backend (port 8000)..."
-python3 -m uvicorn backend.main:app --host 0.0.0.0 --port 8000 &
+echo "  → Starting FastAPI backend (port 8000, $WORKERS workers)..."
+LOGEMENTS_MIGRATE=0 python3 -m uvicorn backend.main:app --host 0.0.0.0 --port 8000 --workers "$WORKERS" &
 BACKEND_PID=$!
 
-# Wait for backend to be ready
-sleep 2
+# Wait for backend to be ready (workers warm up before answering)
+for _ in $(seq 1 30); do
+    curl -sf http://localhost:8000/cache/stats >/dev/null 2>&1 && break
+    kill -0 $BACKEND_PID 2>/dev/null || break
+    sleep 1
+done
 if ! kill -0 $BACKEND_PID 2>/dev/null; then
     echo "❌ Backend failed to start"
     exit 1
@@ -0,0 +1,205 @@
+# Scraping dans Chrome : module importé seulement quand un navigateur sert une
+# zone (SCRAPER_BACKEND=selenium ou page sans annonce dans le HTML statique)
+import os
+import time
+
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from scraper import metrics
+from scraper.parsing import parse_cards, parse_immojeune_card, parse_studapart_card
+
+# Extraction des cartes dans Chrome : bulk (défaut), legacy ou compare
+SCRAPER_EXTRACTION = os.environ.get("SCRAPER_EXTRACTION", "bulk")
+# Garde-fou du défilement : il s'arrête de lui-même dès qu'un scroll n'ajoute
+# rien ; une zone qui grandit encore au dernier scroll est partielle
+MAX_SCROLL_ROUNDS = 20
+
+# ----------------------------
+# FONCTIONS UTILES
+# ----------------------------
+def accept_cookies(driver, selector, timeout=3):
+    # Bandeau absent quand la session a déjà accepté les cookies : attente courte
+    try:
+        WebDriverWait(driver, timeout).until(EC.element_to_be_clickable((By.CSS_SELECTOR, selector))).click()
+    except TimeoutException:
+        pass
+
+def scroll_until_stable(driver, selector, max_rounds, timeout=2):
+    # Scroll tant que de nouvelles cartes apparaissent, au lieu de sleeps fixes.
+    # Renvoie False si max_rounds est atteint alors que la liste grandit encore
+    count = len(driver.find_elements(By.CSS_SELECTOR, selector))
+    for _ in range(max_rounds):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        try:
+            WebDriverWait(driver, timeout).until(
+                lambda d: len(d.find_elements(By.CSS_SELECTOR, selector)) > count
+            )
+        except TimeoutException:
+            return True
+        count = len(driver.find_elements(By.CSS_SELECTOR, selector))
+    return False
+
+def extract_and_parse(driver, site, ville_nom, mode=None):
+    # Extraction des cartes brutes (bulk : un seul execute_script ; legacy :
+    # un appel WebDriver par élément), puis parsing en un seul passage.
+    # SCRAPER_EXTRACTION=compare exécute les deux et affiche les deux temps.
+    mode = mode or SCRAPER_EXTRACTION
+    script, legacy, parse_card = EXTRACTORS[site]
+    timings = {}
+
+    if mode in ("legacy", "compare"):
+        start = time.perf_counter()
+        # En compare, les cartes gardées sont celles du bulk : les échecs du
+        # legacy ne sont pas comptés une seconde fois
+        with metrics.suspended(mode == "compare"):
+            cards = legacy(driver)
+        timings["legacy"] = time.perf_counter() - start
+    if mode in ("bulk", "compare"):
+        start = time.perf_counter()
+        cards = driver.execute_script(script)
+        timings["bulk"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    data_zone = parse_cards(cards, parse_card, ville_nom)
+    timings["parsing"] = time.perf_counter() - start
+
+    print(
+        f"{site} / {ville_nom} : {len(cards)} cartes, {len(data_zone)} annonces ("
+        + ", ".join(f"{name} {duration * 1000:.1f} ms" for name, duration in timings.items()) + ")"
+    )
+    return data_zone
+
+# ----------------------------
+# SCRAPING IMMOJEUNE
+# ----------------------------
+IMMOJEUNE_CARDS_JS = """
+return Array.from(document.querySelectorAll("div.card.col")).map(function (item) {
+    var titre = item.querySelector("p.title a");
+    // Carte sans titre : null, comptée comme échec par parse_cards
+    if (!titre) return null;
+    var image = item.querySelector(".avatar img");
+    return {
+        titre: titre.innerText,
+        url: titre.href,
+        image: image ? image.src : null,
+        badges: Array.from(item.querySelectorAll("span.badge"), function (b) { return b.innerText; }),
+        paragraphs: Array.from(item.querySelectorAll("p"), function (p) { return p.innerText; })
+    };
+});
+"""
+
+def immojeune_cards_legacy(driver):
+    cards = []
+    for item in driver.find_elements(By.CSS_SELECTOR, "div.card.col"):
+        try:
+            # Titre et URL
+            titre_tag = item.find_element(By.CSS_SELECTOR, "p.title a")
+
+            # Image
+            try:
+                image = item.find_element(By.CSS_SELECTOR, ".avatar img").get_attribute("src")
+            except NoSuchElementException:
+                image = None
+
+            cards.append({
+                "titre": titre_tag.text,
+                "url": titre_tag.get_attribute("href"),
+                "image": image,
+                "badges": [badge.text for badge in item.find_elements(By.CSS_SELECTOR, "span.badge")],
+                "paragraphs": [p.text for p in item.find_elements(By.TAG_NAME, "p")],
+            })
+
+        except Exception:
+            # Carte ignorée, comptée dans les échecs de la zone
+            metrics.count_failure()
+            continue
+    return cards
+
+def scrape_immojeune_zone(driver, url_zone, ville_nom):
+    wait = WebDriverWait(driver, 15)
+    driver.get(url_zone)
+
+    # Accepter les cookies si besoin
+    accept_cookies(driver, "button[data-cookiefirst-action='accept']")
+
+    # Attendre que les cartes soient présentes
+    wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.card.col")))
+
+    # Scroll pour charger toutes les annonces
+    if not scroll_until_stable(driver, "div.card.col", max_rounds=MAX_SCROLL_ROUNDS):
+        metrics.mark_partial()
+
+    return extract_and_parse(driver, "ImmoJeune", ville_nom)
+
+
+# ----------------------------
+# SCRAPING STUDAPART
+# ----------------------------
+STUDAPART_CARDS_JS = """
+function textOf(item, selector) {
+    var element = item.querySelector(selector);
+    return element ? element.innerText : null;
+}
+return Array.from(document.querySelectorAll("a.AccomodationBlock")).map(function (item) {
+    if (!item.querySelector("p.AccomodationBlock_title")) return null;
+    var image = item.querySelector(".SliderSimple_imageBackground");
+    return {
+        titre: textOf(item, "p.AccomodationBlock_title"),
+        url: item.href,
+        image_style: image ? image.getAttribute("style") : null,
+        prix_text: textOf(item, "p.ft-l b"),
+        location_text: textOf(item, "div.AccomodationBlock_location.mb-10")
+    };
+});
+"""
+
+def studapart_cards_legacy(driver):
+    cards = []
+
+    def text_of(item, selector):
+        try:
+            return item.find_element(By.CSS_SELECTOR, selector).text
+        except NoSuchElementException:
+            return None
+
+    for item in driver.find_elements(By.CSS_SELECTOR, "a.AccomodationBlock"):
+        try:
+            try:
+                image_style = item.find_element(By.CSS_SELECTOR, ".SliderSimple_imageBackground").get_attribute("style")
+            except NoSuchElementException:
+                image_style = None
+
+            cards.append({
+                "titre": item.find_element(By.CSS_SELECTOR, "p.AccomodationBlock_title").text,
+                "url": item.get_attribute("href"),
+                "image_style": image_style,
+                "prix_text": text_of(item, "p.ft-l b"),
+                "location_text": text_of(item, "div.AccomodationBlock_location.mb-10"),
+            })
+        except Exception:
+            metrics.count_failure()
+            continue
+    return cards
+
+def scrape_studapart_zone(driver, url_zone, ville_nom):
+    wait = WebDriverWait(driver, 20)
+    driver.get(url_zone)
+    accept_cookies(driver, ".didomi-continue-without-agreeing")
+
+    wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "a.AccomodationBlock")))
+    if not scroll_until_stable(driver, "a.AccomodationBlock", max_rounds=MAX_SCROLL_ROUNDS):
+        metrics.mark_partial()
+
+    return extract_and_parse(driver, "Studapart", ville_nom)
+
+# Site -> (script d'extraction groupée, extraction élément par élément, parsing d'une carte)
+EXTRACTORS = {
+    "ImmoJeune": (IMMOJEUNE_CARDS_JS, immojeune_cards_legacy, parse_immojeune_card),
+    "Studapart": (STUDAPART_CARDS_JS, studapart_cards_legacy, parse_studapart_card),
+}
+
+# Site -> scraper de zone Selenium (driver, url, ville)
+SELENIUM_ZONES = {"ImmoJeune": scrape_immojeune_zone, "Studapart": scrape_studapart_zone}
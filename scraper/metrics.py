@@ -0,0 +1,62 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Rapport de la zone en cours, par thread : chaque zone est scrapée entièrement
+# dans un thread du pool (fallback Selenium compris)
+_current = threading.local()
+
+
+@contextmanager
+def zone(site, ville):
+    report = {
+        "site": site, "ville": ville, "debut": int(time.time()), "duree_s": None,
+        "cartes": 0, "annonces": 0, "echecs": 0, "erreur": None, "complet": True,
+    }
+    _current.report = report
+    start = time.perf_counter()
+    try:
+        yield report
+    except Exception as e:
+        report["erreur"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        report["duree_s"] = round(time.perf_counter() - start, 3)
+        _current.report = None
+
+
+@contextmanager
+def suspended(active=True):
+    # Comptage de la zone en cours interrompu le temps du bloc
+    report = getattr(_current, "report", None)
+    if active:
+        _current.report = None
+    try:
+        yield
+    finally:
+        _current.report = report
+
+
+def mark_partial():
+    # Zone lue en partie seulement (pages ou défilement non épuisés) : ses
+    # annonces absentes ne doivent pas être retirées
+    report = getattr(_current, "report", None)
+    if report is not None:
+        report["complet"] = False
+
+
+def count_cards(cards, rows):
+    # Cartes trouvées sur la page et lignes produites ; l'écart = échecs de parsing
+    report = getattr(_current, "report", None)
+    if report is not None:
+        report["cartes"] += cards
+        report["annonces"] += rows
+        report["echecs"] += cards - rows
+
+
+def count_failure():
+    # Carte illisible avant même le parsing (extraction Selenium élément par élément)
+    report = getattr(_current, "report", None)
+    if report is not None:
+        report["cartes"] += 1
+        report["echecs"] += 1
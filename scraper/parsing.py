@@ -0,0 +1,139 @@
+import re
+from datetime import datetime
+
+from scraper import metrics
+
+# ----------------------------
+# FONCTIONS UTILES
+# ----------------------------
+def normalize_type(type_bien):
+    t = type_bien.upper() if type_bien else ""
+    if "STUDIO" in t: return "STUDIO"
+    if "T1" in t: return "T1"
+    if "T2" in t: return "T2"
+    if "T3" in t: return "T3"
+    return None
+
+def extract_surface(text):
+    if not text:
+        return None
+    text = text.lower().replace(",", ".").replace("m²", "m2")
+    match = re.search(r"(\d+(?:\.\d+)?)\s*(?:à\s*(\d+(?:\.\d+)?))?\s*m2", text)
+    if match:
+        surface = (float(match.group(1)) + float(match.group(2))) / 2 if match.group(2) else float(match.group(1))
+        return round(surface, 2) if surface <= 80 else None
+    return None
+
+def extract_prix(text):
+    # Cherche le prix en euros même si texte sale
+    m = re.search(r"(\d[\d\s]*)\s*€", text)
+    if m:
+        try:
+            return int(re.sub(r"\s", "", m.group(1)))
+        except ValueError:
+            return None
+    return None
+
+def now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+# ----------------------------
+# CARTES BRUTES -> LIGNES
+# ----------------------------
+# Une carte brute est un dict de textes/attributs extraits de la page, quel
+# que soit le moteur (lxml sur le HTML statique ou Selenium) ; ces fonctions
+# renvoient le tuple à insérer, ou None si la carte est incomplète.
+
+def parse_immojeune_card(card, ville_nom, date_scraping=None):
+    # card : titre, url, image, badges (textes), paragraphs (textes des <p>)
+    titre = (card.get("titre") or "").strip()
+
+    # Type de bien
+    type_bien = None
+    for badge in card.get("badges") or []:
+        type_bien = normalize_type(badge)
+        if type_bien:
+            break
+
+    prix = surface = None
+
+    # Boucle sur tous les <p> pour extraire surface et prix
+    for p in card.get("paragraphs") or []:
+        txt = p.replace("\n", " ").replace("\r", " ").strip()
+
+        # Surface
+        if not surface:
+            surface = extract_surface(txt)
+
+        # Prix
+        if not prix:
+            prix = extract_prix(txt)
+
+    # Ajouter uniquement si on a tout : prix, surface, type
+    if prix and surface and type_bien:
+        return (
+            titre,
+            prix,
+            surface,
+            round(prix / surface, 2),
+            type_bien,
+            ville_nom,
+            "ImmoJeune",
+            card.get("image"),
+            card.get("url"),
+            date_scraping or now()
+        )
+    return None
+
+def parse_studapart_card(card, ville_nom, date_scraping=None):
+    # card : titre, url, image_style, prix_text, location_text
+    titre = (card.get("titre") or "").strip()
+
+    # Image
+    image = None
+    m = re.search(r'url\("?(.*?)"?\)', card.get("image_style") or "")
+    if m:
+        image = m.group(1)
+
+    # Prix
+    prix = None
+    prix_text = re.sub(r"[€\s]", "", card.get("prix_text") or "")
+    if prix_text.isdigit() and prix_text != "0":
+        prix = int(prix_text)
+
+    # Surface
+    surface_text = card.get("location_text") or ""
+    surface = extract_surface(surface_text)
+
+    # Type de bien
+    type_bien = None
+    if "studio" in titre.lower() or "studio" in surface_text.lower():
+        type_bien = "STUDIO"
+    elif "1 chambre" in surface_text.lower():
+        type_bien = "T1"
+    elif "2 chambres" in surface_text.lower():
+        type_bien = "T2"
+    elif "3 chambres" in surface_text.lower():
+        type_bien = "T3"
+
+    if prix and surface and type_bien:
+        return (titre, prix, surface, round(prix / surface, 2), type_bien, ville_nom, "Studapart", image, card.get("url"), date_scraping or now())
+    return None
+
+def parse_cards(cards, parse_card, ville_nom):
+    # Parsing groupé : une seule date pour la page ; les cartes incomplètes ou
+    # illisibles (None : sans titre à l'extraction) sont ignorées et comptées
+    # comme échecs de la zone
+    date_scraping = now()
+    rows = []
+    for card in cards:
+        if card is None:
+            continue
+        try:
+            row = parse_card(card, ville_nom, date_scraping)
+        except Exception:
+            row = None
+        if row:
+            rows.append(row)
+    metrics.count_cards(len(cards), len(rows))
+    return rows
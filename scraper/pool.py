@@ -0,0 +1,130 @@
+import queue
+import threading
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from scraper import metrics
+
+
+def chrome_factory():
+    # Import tardif : le scraping HTTP n'a pas besoin de charger Selenium
+    from selenium import webdriver
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--window-size=1280,2000")
+    return webdriver.Chrome(options=options)
+
+
+class DriverPool:
+    """Pool borné de sessions WebDriver réutilisées d'une zone à l'autre.
+
+    Les navigateurs sont créés à la demande (au plus `size`) puis rendus au
+    pool ; une session qui a planté est jetée et sera recréée.
+    """
+
+    def __init__(self, size=4, factory=chrome_factory):
+        self.size = size
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(size)
+
+    @contextmanager
+    def driver(self):
+        self._slots.acquire()
+        try:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = self.factory()
+                with self._lock:
+                    self._created += 1
+            try:
+                yield driver
+            except Exception:
+                self._discard(driver)
+                raise
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+def with_driver(pool, scrape_zone):
+    # Adapte scrape_zone(driver, url, ville) en fonction (url, ville) servie par le pool
+    def scrape(url, ville):
+        with pool.driver() as driver:
+            return scrape_zone(driver, url, ville)
+    return scrape
+
+
+def run_zones(zones, workers, site_limits=None):
+    """Scrape les zones en parallèle : (site, fonction(url, ville), url, ville) -> lignes.
+
+    `site_limits` borne le nombre de zones simultanées par site pour ne pas
+    surcharger une même source. Une zone n'est confiée à un worker que si son
+    site a de la place : une zone en attente de son site n'occupe pas un
+    worker dont une zone d'un autre site pourrait se servir. Renvoie (lignes,
+    {(site, ville): erreur}, rapports par zone : durée, cartes, annonces,
+    échecs de parsing, erreur).
+    """
+    site_limits = site_limits or {}
+    # File par site, dans l'ordre des zones
+    pending = {}
+    for index, zone in enumerate(zones):
+        pending.setdefault(zone[0], deque()).append((index, zone))
+    running = Counter()
+
+    def next_zone():
+        # Zone la plus ancienne parmi les sites qui ont encore de la place
+        ready = [
+            waiting for site, waiting in pending.items()
+            if waiting and running[site] < site_limits.get(site, workers)
+        ]
+        return min(ready, key=lambda waiting: waiting[0][0]).popleft() if ready else None
+
+    reports = []
+
+    def scrape(zone):
+        site, scrape_zone, url, ville = zone
+        with metrics.zone(site, ville) as report:
+            reports.append(report)
+            return scrape_zone(url, ville)
+
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        while True:
+            while len(in_flight) < workers and (item := next_zone()):
+                index, zone = item
+                running[zone[0]] += 1
+                in_flight[executor.submit(scrape, zone)] = (index, zone)
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, (site, _, _, ville) = in_flight.pop(future)
+                running[site] -= 1
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    print(f"Erreur sur la zone {site} / {ville} :", e)
+                    errors[(site, ville)] = e
+    rows = [row for index in sorted(results) for row in results[index]]
+    return rows, errors, reports
@@ -0,0 +1,205 @@
+import os
+import re
+
+import requests
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from scraper import metrics
+from scraper.parsing import parse_cards, parse_immojeune_card, parse_studapart_card
+
+# SCRAPER_FIXTURES=record : enregistre chaque page téléchargée
+# SCRAPER_FIXTURES=replay : relit les pages enregistrées, sans réseau
+FIXTURES_MODE = os.environ.get("SCRAPER_FIXTURES")
+FIXTURES_DIR = os.environ.get("SCRAPER_FIXTURES_DIR", os.path.join(os.path.dirname(__file__), "fixtures"))
+# Pages suivies au plus par zone (liens rel="next")
+MAX_PAGES = 20
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+
+def make_session(pool_size=10):
+    # Session keep-alive partagée : une connexion TLS par hôte, réutilisée
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "fr-FR,fr;q=0.9"})
+    return session
+
+
+class FixtureStore:
+    """Pages HTML enregistrées sur disque, une par (site, url)."""
+
+    def __init__(self, directory=FIXTURES_DIR, mode=FIXTURES_MODE):
+        self.directory = directory
+        self.mode = mode
+
+    def path(self, site, url):
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", url.split("://", 1)[-1]).strip("_")
+        return os.path.join(self.directory, site.lower(), slug + ".html")
+
+    def load(self, site, url):
+        with open(self.path(site, url), encoding="utf-8") as f:
+            return f.read()
+
+    def save(self, site, url, page):
+        path = self.path(site, url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(page)
+
+
+def text(element):
+    return " ".join(element.text_content().split()) if element is not None else None
+
+def first(element, selector):
+    found = element.cssselect(selector)
+    return found[0] if found else None
+
+
+class SourceAdapter:
+    """Source d'annonces : téléchargement HTTP, extraction des cartes, conversion en lignes.
+
+    Les pages d'une zone sont suivies par leurs liens rel="next". Une zone
+    dont le HTML statique ne contient aucune carte (rendu côté client) ou
+    s'arrête sur une page pleine (`page_size` cartes, la suite se charge au
+    défilement) est confiée à `fallback(url, ville)`, typiquement le scraper
+    Selenium de la source servi par le pool de navigateurs. Sans fallback,
+    la zone est marquée partielle et ne retire aucune annonce.
+    """
+
+    site = None
+    card_selector = None
+    # Cartes d'un lot servi avant défilement ; volontairement bas : une page
+    # qui en a autant passe par le navigateur
+    page_size = None
+    zones = []
+
+    def __init__(self, session=None, fixtures=None, fallback=None):
+        self.session = session or make_session()
+        self.fixtures = fixtures or FixtureStore()
+        self.fallback = fallback
+
+    def fetch(self, url):
+        if self.fixtures.mode == "replay":
+            return self.fixtures.load(self.site, url)
+        response = self.session.get(url, timeout=20)
+        response.raise_for_status()
+        page = response.text
+        if self.fixtures.mode == "record":
+            self.fixtures.save(self.site, url, page)
+        return page
+
+    def extract_cards(self, tree):
+        raise NotImplementedError
+
+    def parse_card(self, card, ville, date_scraping=None):
+        raise NotImplementedError
+
+    def page_tree(self, page, url):
+        tree = lxml_html.fromstring(page)
+        tree.make_links_absolute(url)
+        return tree
+
+    def next_page(self, tree):
+        link = first(tree, 'link[rel="next"], a[rel="next"]')
+        return link.get("href") if link is not None else None
+
+    def parse_page(self, page, url, ville):
+        cards = self.extract_cards(self.page_tree(page, url))
+        return cards, parse_cards(cards, self.parse_card, ville)
+
+    def scrape_zone(self, url, ville):
+        cards, page_url = [], url
+        for _ in range(MAX_PAGES):
+            tree = self.page_tree(self.fetch(page_url), page_url)
+            page_cards = self.extract_cards(tree)
+            cards += page_cards
+            page_url = self.next_page(tree) if any(page_cards) else None
+            if page_url is None:
+                break
+        complete = page_url is None and (self.page_size is None or len(page_cards) < self.page_size)
+        # Rendu côté client ou zone incomplète : le navigateur lit toute la
+        # zone. Les cartes ne sont parsées (et les échecs comptés) que par le
+        # chemin retenu, le navigateur recomptant les siennes
+        if not (any(cards) and complete) and self.fallback:
+            return self.fallback(url, ville)
+        if not complete:
+            metrics.mark_partial()
+        return parse_cards(cards, self.parse_card, ville)
+
+
+class ImmoJeuneAdapter(SourceAdapter):
+    site = "ImmoJeune"
+    card_selector = "div.card.col"
+    page_size = 20
+    zones = [
+        ("https://www.immojeune.com/logement-etudiant/paris-75.html", "Paris"),
+        ("https://www.immojeune.com/logement-etudiant/marseille-13.html", "Marseille"),
+        ("https://www.immojeune.com/logement-etudiant/lyon-69.html", "Lyon"),
+        ("https://www.immojeune.com/logement-etudiant/bordeaux-33.html", "Bordeaux")
+    ]
+
+    def extract_cards(self, tree):
+        cards = []
+        for item in tree.cssselect(self.card_selector):
+            titre_tag = first(item, "p.title a")
+            if titre_tag is None:
+                # Carte illisible : gardée à None pour être comptée en échec
+                cards.append(None)
+                continue
+            image = first(item, ".avatar img")
+            cards.append({
+                "titre": text(titre_tag),
+                "url": titre_tag.get("href"),
+                "image": image.get("src") if image is not None else None,
+                "badges": [text(badge) for badge in item.cssselect("span.badge")],
+                "paragraphs": [text(p) for p in item.iter("p")],
+            })
+        return cards
+
+    def parse_card(self, card, ville, date_scraping=None):
+        return parse_immojeune_card(card, ville, date_scraping)
+
+
+class StudapartAdapter(SourceAdapter):
+    site = "Studapart"
+    card_selector = "a.AccomodationBlock"
+    page_size = 10
+    zones = [
+        ("https://www.studapart.com/fr/logement-etudiant-paris", "Paris"),
+        ("https://www.studapart.com/fr/logement-etudiant-bordeaux", "Bordeaux"),
+        ("https://www.studapart.com/fr/logement-etudiant-lille", "Lille"),
+        ("https://www.studapart.com/fr/logement-etudiant-lyon", "Lyon"),
+        ("https://www.studapart.com/fr/logement-etudiant-toulouse", "Toulouse"),
+        ("https://www.studapart.com/fr/logement-etudiant-marseille", "Marseille")
+    ]
+
+    def extract_cards(self, tree):
+        cards = []
+        for item in tree.cssselect(self.card_selector):
+            titre = first(item, "p.AccomodationBlock_title")
+            if titre is None:
+                cards.append(None)
+                continue
+            image = first(item, ".SliderSimple_imageBackground")
+            cards.append({
+                "titre": text(titre),
+                "url": item.get("href"),
+                "image_style": image.get("style") if image is not None else None,
+                "prix_text": text(first(item, "p.ft-l b")),
+                "location_text": text(first(item, "div.AccomodationBlock_location.mb-10")),
+            })
+        return cards
+
+    def parse_card(self, card, ville, date_scraping=None):
+        return parse_studapart_card(card, ville, date_scraping)
+
+
+ADAPTERS = [ImmoJeuneAdapter, StudapartAdapter]
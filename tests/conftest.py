@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import Counter
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from lxml import html as lxml_html
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Serveur HTTP local des pages de tests/fixtures.
+
+    Chaque réponse est retardée de `delay` secondes ; le serveur relève le
+    nombre maximal de requêtes simultanées par site (premier segment du
+    chemin) et au total, pour vérifier les limites du planificateur.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(("127.0.0.1", 0), partial(FixtureHandler, directory=FIXTURES))
+        self.delay = delay
+        self.in_flight = Counter()
+        self.max_in_flight = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def enter(self, site):
+        with self._lock:
+            for key in (site, "total"):
+                self.in_flight[key] += 1
+                self.max_in_flight[key] = max(self.max_in_flight[key], self.in_flight[key])
+
+    def leave(self, site):
+        with self._lock:
+            for key in (site, "total"):
+                self.in_flight[key] -= 1
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    # Pages en UTF-8, annoncé comme par les vrais sites (m², €)
+    extensions_map = {**SimpleHTTPRequestHandler.extensions_map, ".html": "text/html; charset=utf-8"}
+
+    def do_GET(self):
+        site = self.path.lstrip("/").split("/", 1)[0]
+        self.server.enter(site)
+        try:
+            time.sleep(self.server.delay)
+            super().do_GET()
+        finally:
+            self.server.leave(site)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fixture_server():
+    server = FixtureServer(delay=0.1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class StaticPageDriver:
+    """WebDriver minimal sur le serveur de fixtures, pour les tests sans Chrome.
+
+    get() charge une page ; chaque scroll (execute_script) ajoute les cartes
+    de la page suivante (page2.html, page3.html...) si elle existe, comme un
+    défilement infini. find_elements accepte les sélecteurs CSS.
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.pages = []
+        self.url = None
+        self.page = 1
+        self.scrolls = 0
+
+    def get(self, url):
+        self.url, self.page = url, 1
+        self.pages = [self._load(url)]
+
+    def _load(self, url):
+        response = self.session.get(url, timeout=5)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        tree = lxml_html.fromstring(response.text)
+        tree.make_links_absolute(url)
+        return tree
+
+    def execute_script(self, script, *args):
+        if "scrollTo" in script:
+            self.scrolls += 1
+            following = self.url.replace("page1.html", f"page{self.page + 1}.html")
+            loaded = self._load(following) if following != self.url else None
+            if loaded is not None:
+                self.page += 1
+                self.pages.append(loaded)
+
+    def find_elements(self, by, selector):
+        return [element for tree in self.pages if tree is not None for element in tree.cssselect(selector)]
+
+    def quit(self):
+        self.session.close()
@@ -0,0 +1,61 @@
+import pytest
+
+from backend.alerts import SearchIndex, create_search, list_alerts
+from backend.database import create_table, get_connection
+from backend.ingest import ingest
+from test_ingest import annonce
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / "logements.db")
+    create_table(path)
+    conn = get_connection(path)
+    yield conn
+    conn.close()
+
+
+def listing(prix=600, surface=25.0, ville_norm="lyon", type_bien_norm="t1"):
+    return {"actif": 1, "prix": prix, "surface": surface, "prix_m2": prix / surface,
+            "ville_norm": ville_norm, "type_bien_norm": type_bien_norm}
+
+
+def test_index_matches_thresholds_and_wildcards():
+    index = SearchIndex([
+        (1, "lyon", "t1", 20, 700),    # Lyon, T1, 20 m² et 700 € au plus
+        (2, "lyon", None, None, 500),  # Lyon, tout type, 500 € au plus
+        (3, None, "t1", 30, None),     # toute ville, T1, 30 m² au moins
+        (4, None, None, None, None),   # tout
+        (5, "paris", "t1", None, None),
+    ])
+    assert sorted(index.match(listing())) == [1, 4]
+    assert sorted(index.match(listing(prix=450, surface=35.0))) == [1, 2, 3, 4]
+    assert sorted(index.match(listing(ville_norm="paris"))) == [4, 5]
+    # Lignes écartées par le nettoyage de filter_clause
+    assert index.match(listing(surface=8.0)) == []
+
+
+def test_outbox_alerts_again_only_below_the_lowest_price(conn):
+    search_id = create_search(conn, ville="Lyon", prix_max=700)
+    url = "https://ex/a"
+
+    def run(prix, now):
+        return ingest([annonce("A", url, prix=prix)], conn=conn, now=now)["alertes"]
+
+    assert run(600, 1000) == 1
+    # Prix inchangé : l'annonce n'est pas modifiée, pas d'alerte
+    assert run(600, 2000) == 0
+    # Hausse sous prix_max : pas de nouvelle alerte
+    assert run(650, 3000) == 0
+    # Retour à un prix déjà signalé : rien non plus
+    assert run(600, 4000) == 0
+    # Baisse sous le plus bas prix signalé : nouvelle alerte
+    assert run(550, 5000) == 1
+    assert [a["prix"] for a in list_alerts(conn, recherche_id=search_id)] == [600, 550]
+
+
+def test_listing_above_prix_max_is_not_alerted(conn):
+    create_search(conn, ville="Lyon", prix_max=500)
+    stats = ingest([annonce("A", "https://ex/a", prix=600), annonce("P", "https://ex/p", prix=450, ville="Paris")],
+                   conn=conn, now=1000)
+    assert stats["alertes"] == 0
@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import database, main
+from backend.cache import GenerationClock, ResponseCache
+from backend.database import create_table, get_connection
+from backend.ingest import ingest
+from test_ingest import annonce
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "logements.db")
+    create_table(path)
+    conn = get_connection(path)
+    ingest([annonce("A", "https://ex/a"), annonce("B", "https://ex/b", prix=700)], conn=conn, now=1000)
+    conn.close()
+    monkeypatch.setattr(database, "DB_PATH", path)
+    # État du module remis à neuf : cache, génération et index d'une autre base
+    monkeypatch.setattr(main, "response_cache", ResponseCache())
+    monkeypatch.setattr(main, "sql_generation", GenerationClock())
+    monkeypatch.setattr(main, "deal_index", None)
+    yield path
+    database.read_pool(path).close()
+
+
+def test_async_route_survives_a_second_lifespan(db):
+    # Deux démarrages dans le même processus (rechargement, second client) ;
+    # limit change pour que la réponse soit calculée dans l'executor
+    for limit in (10, 20):
+        with TestClient(main.app) as client:
+            response = client.get("/logements/async", params={"sort": "prix", "limit": limit})
+            assert response.status_code == 200
+            assert [item["titre"] for item in response.json()["items"]] == ["A", "B"]
+
+
+def test_deal_index_is_built_on_first_use(db):
+    with TestClient(main.app) as client:
+        assert main.deal_index is None
+        assert client.get("/logements/bonnes-affaires", params={"k": 1}).status_code == 200
+        assert main.deal_index is not None
+
+
+def test_total_is_counted_on_the_first_page_only(db):
+    from backend import queries
+    from backend.snapshot import SnapshotEngine
+
+    for get_logements in (queries.get_logements, SnapshotEngine().get_logements):
+        first = get_logements(sort="prix", limit=1)
+        assert first["total"] == 2 and [item["titre"] for item in first["items"]] == ["A"]
+        following = get_logements(sort="prix", limit=1, cursor=first["next_cursor"])
+        assert following["total"] is None and [item["titre"] for item in following["items"]] == ["B"]
+
+
+def test_stats_route_summarizes_each_group(db):
+    with TestClient(main.app) as client:
+        response = client.get("/stats", params={"ville": "lyon", "group_by": ["ville"]})
+    assert response.status_code == 200
+    (group,) = response.json()
+    prix = group["prix"]
+    assert prix["count"] == 2 and prix["mean"] == 650
+    # Deux annonces à 600 et 700 € : médiane entre les deux, p90 près du haut
+    assert prix["median"] == pytest.approx(650, rel=0.02)
+    assert prix["p90"] == pytest.approx(690, rel=0.02)
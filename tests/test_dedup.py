@@ -0,0 +1,63 @@
+from backend.database import normalize_type_bien, normalize_ville
+from backend.dedup import cluster, shingles
+
+
+def record(id_, titre, url, prix=800, surface=27.0, ville="Marseille", type_bien="T1"):
+    return {
+        "id": id_, "titre": titre, "url": url, "prix": prix, "surface": surface,
+        "ville_norm": normalize_ville(ville), "type_bien_norm": normalize_type_bien(type_bien),
+    }
+
+
+def groups(records):
+    clusters = cluster(records)
+    result = {}
+    for id_, representative in clusters.items():
+        result.setdefault(representative, set()).add(id_)
+    return sorted(sorted(members) for members in result.values())
+
+
+def test_truncated_titles_share_their_shingles():
+    # ImmoJeune coupe à 39 caractères, Studapart à 50
+    assert shingles("Location étudiante T2 meublé – 7e Marse...") == \
+        shingles("Location étudiante T2 meublé – 7e Marseille, à 2 m")
+
+
+def test_cross_source_pair_is_grouped():
+    records = [
+        record(163, "Location étudiante T2 meublé – 7e Marse...",
+               "https://www.immojeune.com/location-etudiant/marseille-07-13/location-etudiante-t2-meuble-7e-marseille_3935851.html"),
+        record(373, "Location étudiante T2 meublé – 7e Marseille, à 2 m",
+               "https://www.studapart.com/fr/logement-Marseille/Logement-entier-pour-2-personnes-de-27m2/property/b7eb7d73"),
+        record(5, "Studio lumineux proche du Vieux-Port", "https://www.immojeune.com/location-etudiant/marseille/studio_1.html",
+               prix=620, surface=18.0),
+    ]
+    assert groups(records) == [[5], [163, 373]]
+
+
+def test_identical_titles_on_two_sites_in_a_small_corpus():
+    # Deux annonces seulement : aucun jeton ne doit être écarté comme fréquent
+    records = [
+        record(1, "Studio meublé Cours Julien", "https://www.immojeune.com/location-etudiant/marseille/studio_11.html", prix=650),
+        record(2, "Studio meublé Cours Julien", "https://www.studapart.com/fr/logement-Marseille/property/abc", prix=640),
+    ]
+    # Le moins cher représente le groupe
+    assert cluster(records) == {1: 2, 2: 2}
+
+
+def test_same_site_templated_titles_stay_apart():
+    # Même titre type dans deux résidences du même site : urls différentes
+    records = [
+        record(i, "Studio de 20m² meublé et équipé",
+               f"https://www.immojeune.com/residence-etudiante/{slug}_{i}.html", prix=900, surface=20.0)
+        for i, slug in enumerate(["rueil-92/residence-odalys-rueil", "villejuif-94/residence-twenty-campus-gorki"])
+    ]
+    assert groups(records) == [[0], [1]]
+
+
+def test_different_surface_is_not_a_duplicate():
+    records = [
+        record(1, "Studio meublé Cours Julien", "https://www.immojeune.com/a.html", surface=18.0),
+        record(2, "Studio meublé Cours Julien", "https://www.studapart.com/b", surface=25.0),
+    ]
+    assert groups(records) == [[1], [2]]
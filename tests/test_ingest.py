@@ -0,0 +1,92 @@
+import pytest
+
+from backend.database import SCRAPED_COLUMNS, create_table, get_connection
+from backend.ingest import ingest
+from backend.stats import load_stats, summarize
+
+
+def annonce(titre, url, prix=600, surface=25.0, ville="Lyon", site="ImmoJeune", type_bien="T1"):
+    record = {
+        "titre": titre, "prix": prix, "surface": surface, "prix_m2": round(prix / surface, 2),
+        "type_bien": type_bien, "ville": ville, "site_source": site, "image": None, "url": url,
+        "date_scraping": "2026-10-18 10:00:00",
+    }
+    return tuple(record[c] for c in SCRAPED_COLUMNS)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / "logements.db")
+    create_table(path)
+    conn = get_connection(path)
+    yield conn
+    conn.close()
+
+
+def state(conn):
+    return {
+        (url, titre): (ville, prix, actif)
+        for url, titre, ville, prix, actif in conn.execute("SELECT url, titre, ville, prix, actif FROM logements")
+    }
+
+
+def test_insert_update_unchanged_deactivate(conn):
+    a, b, c = annonce("A", "https://ex/a"), annonce("B", "https://ex/b"), annonce("C", "https://ex/c")
+    stats = ingest([a, b, c], conn=conn, now=1000)
+    assert len(stats["inserted"]) == 3 and not stats["updated"] and not stats["deactivated"]
+
+    # B change de prix, A inchangée, C absente de sa zone : retirée
+    stats = ingest([a, annonce("B", "https://ex/b", prix=550)], conn=conn, now=2000)
+    assert stats["unchanged"] == 1
+    assert len(stats["updated"]) == 1 and len(stats["deactivated"]) == 1 and not stats["inserted"]
+    assert state(conn) == {
+        ("https://ex/a", "A"): ("Lyon", 600, 1),
+        ("https://ex/b", "B"): ("Lyon", 550, 1),
+        ("https://ex/c", "C"): ("Lyon", 600, 0),
+    }
+
+    # C revient : réactivée, pas réinsérée
+    stats = ingest([a, annonce("B", "https://ex/b", prix=550), c], conn=conn, now=3000)
+    assert len(stats["updated"]) == 1 and not stats["inserted"]
+    assert state(conn)[("https://ex/c", "C")] == ("Lyon", 600, 1)
+
+
+def test_failed_zone_is_left_untouched(conn):
+    ingest([annonce("A", "https://ex/a"), annonce("P", "https://ex/p", ville="Paris")], conn=conn, now=1000)
+
+    # Zone Paris en échec : aucune ligne, ses annonces restent actives
+    stats = ingest([annonce("A", "https://ex/a")], conn=conn, now=2000)
+    assert not stats["deactivated"]
+    assert state(conn)[("https://ex/p", "P")] == ("Paris", 600, 1)
+
+
+def test_listing_moved_to_another_zone(conn):
+    ingest([annonce("A", "https://ex/a", ville="Lyon")], conn=conn, now=1000)
+
+    # La zone Lyon échoue, l'annonce apparaît dans la zone Villeurbanne : mise à
+    # jour de la ligne existante, pas d'insertion en double
+    stats = ingest([annonce("A", "https://ex/a", ville="Villeurbanne")], conn=conn, now=2000)
+    assert not stats["inserted"] and len(stats["updated"]) == 1
+    assert state(conn) == {("https://ex/a", "A"): ("Villeurbanne", 600, 1)}
+
+    # Puis Lyon est scrapée sans elle : l'annonce n'est plus dans Lyon, rien à retirer
+    stats = ingest([annonce("L", "https://ex/l", ville="Lyon")], conn=conn, now=3000)
+    assert not stats["deactivated"]
+    assert state(conn)[("https://ex/a", "A")] == ("Villeurbanne", 600, 1)
+
+
+def test_partial_zone_does_not_deactivate(conn):
+    ingest([annonce("A", "https://ex/a"), annonce("B", "https://ex/b")], conn=conn, now=1000)
+
+    # Lyon lue en partie (premier lot seulement) : B n'est pas retirée
+    stats = ingest([annonce("A", "https://ex/a", prix=550)], conn=conn, now=2000,
+                   partial_zones={("ImmoJeune", "Lyon")})
+    assert len(stats["updated"]) == 1 and not stats["deactivated"]
+    assert state(conn)[("https://ex/b", "B")] == ("Lyon", 600, 1)
+
+
+def test_stats_follow_changes(conn):
+    ingest([annonce("A", "https://ex/a"), annonce("B", "https://ex/b", prix=900)], conn=conn, now=1000)
+    ingest([annonce("A", "https://ex/a")], conn=conn, now=2000)
+    (group,) = summarize(load_stats(conn), ["ville"])
+    assert group["prix"]["count"] == 1
@@ -0,0 +1,37 @@
+import time
+
+from backend import metrics
+
+
+def test_slow_request_profile_is_written_from_stable_samples(tmp_path):
+    profiler = metrics.SlowRequestProfiler(threshold_ms=10, interval_ms=1, directory=str(tmp_path))
+    profiler.start()
+    try:
+        timings, token = metrics.begin_request()
+        profiler.track(timings)
+        with metrics.span("sql"):
+            deadline = time.perf_counter() + 0.05
+            while time.perf_counter() < deadline:
+                pass
+        path = profiler.finish(timings, "GET /logements", 0.05)
+        metrics.end_request(token)
+        samples = dict(timings.samples)
+        # Requête terminée : le thread d'échantillonnage n'y touche plus
+        time.sleep(0.02)
+        assert dict(timings.samples) == samples
+    finally:
+        profiler.stop()
+
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    assert lines and sum(int(line.rsplit(" ", 1)[1]) for line in lines) == sum(samples.values())
+    assert any("test_metrics.py:" in line for line in lines)
+
+
+def test_fast_request_writes_no_profile(tmp_path):
+    profiler = metrics.SlowRequestProfiler(threshold_ms=1000, directory=str(tmp_path))
+    timings, token = metrics.begin_request()
+    profiler.track(timings)
+    assert profiler.finish(timings, "GET /logements", 0.01) is None
+    metrics.end_request(token)
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,162 @@
+import time
+
+import pytest
+
+from conftest import StaticPageDriver
+from scraper import metrics
+from scraper.pool import DriverPool, run_zones, with_driver
+from scraper.sources import ImmoJeuneAdapter, StudapartAdapter, make_session
+
+pytest.importorskip("selenium")
+from scraper.browser import scroll_until_stable  # noqa: E402
+
+
+def http_zones(server, adapters, count):
+    # count zones par site, toutes servies par la même page de fixtures
+    session = make_session(pool_size=8)
+    zones = []
+    for adapter_class in adapters:
+        adapter = adapter_class(session=session)
+        page = f"{server.url}/{adapter.site.lower()}/lyon.html"
+        zones += [(adapter.site, adapter.scrape_zone, f"{page}?zone={i}", f"Lyon {i}") for i in range(count)]
+    return zones
+
+
+def test_run_zones_respects_worker_and_site_limits(fixture_server):
+    zones = http_zones(fixture_server, [ImmoJeuneAdapter, StudapartAdapter], count=4)
+    rows, errors, reports = run_zones(zones, workers=3, site_limits={"ImmoJeune": 1, "Studapart": 2})
+
+    assert not errors
+    assert fixture_server.max_in_flight["immojeune"] == 1
+    assert fixture_server.max_in_flight["studapart"] == 2
+    assert fixture_server.max_in_flight["total"] <= 3
+    # 2 annonces complètes par page et par site, 4 zones chacun
+    assert len(rows) == 16
+    assert len(reports) == 8
+    # ImmoJeune : une carte sans titre et une sans surface, comptées en échecs
+    assert {(r["site"], r["cartes"], r["annonces"], r["echecs"]) for r in reports} == {
+        ("ImmoJeune", 4, 2, 2), ("Studapart", 2, 2, 0),
+    }
+
+
+def test_zone_waiting_for_its_site_does_not_hold_a_worker():
+    # 6 zones ImmoJeune puis 4 Studapart de 0.3 s, 2 par site, 4 workers :
+    # 3 vagues ImmoJeune, Studapart en parallèle dès le départ, soit 0.9 s.
+    # Des workers bloqués sur la limite d'ImmoJeune donneraient 1.2 s
+    def slow_zone(url, ville):
+        time.sleep(0.3)
+        return [ville]
+
+    zones = [("ImmoJeune", slow_zone, None, f"IJ {i}") for i in range(6)]
+    zones += [("Studapart", slow_zone, None, f"SP {i}") for i in range(4)]
+    start = time.perf_counter()
+    rows, errors, _ = run_zones(zones, workers=4, site_limits={"ImmoJeune": 2, "Studapart": 2})
+    elapsed = time.perf_counter() - start
+
+    assert not errors
+    # Lignes dans l'ordre des zones, quel que soit l'ordre d'exécution
+    assert rows == [zone[3] for zone in zones]
+    assert elapsed < 1.1
+
+
+def test_failed_zone_does_not_stop_the_others(fixture_server):
+    zones = http_zones(fixture_server, [ImmoJeuneAdapter], count=2)
+    adapter = ImmoJeuneAdapter(session=make_session())
+    zones.append(("ImmoJeune", adapter.scrape_zone, f"{fixture_server.url}/immojeune/absente.html", "Nulle part"))
+
+    rows, errors, reports = run_zones(zones, workers=2)
+
+    assert list(errors) == [("ImmoJeune", "Nulle part")]
+    assert len(rows) == 4
+    failed = [r for r in reports if r["ville"] == "Nulle part"]
+    assert failed[0]["erreur"].startswith("HTTPError")
+
+
+def test_client_rendered_page_is_counted_once_by_the_fallback(fixture_server):
+    def fallback(url, ville):
+        # Le navigateur compte lui-même ses cartes : une lue, une illisible
+        metrics.count_cards(2, 1)
+        return [("navigateur", ville)]
+
+    adapter = ImmoJeuneAdapter(session=make_session(), fallback=fallback)
+    zones = [("ImmoJeune", adapter.scrape_zone, f"{fixture_server.url}/immojeune/rendu-client.html", "Lyon")]
+    rows, errors, reports = run_zones(zones, workers=1)
+
+    assert rows == [("navigateur", "Lyon")]
+    # Les squelettes du HTML statique ne sont pas comptés en plus
+    assert (reports[0]["cartes"], reports[0]["echecs"]) == (2, 1)
+
+
+def studapart_zone(server, page, page_size, fallback=None):
+    adapter = StudapartAdapter(session=make_session(), fallback=fallback)
+    adapter.page_size = page_size
+    return [("Studapart", adapter.scrape_zone, f"{server.url}/studapart/{page}", "Toulouse")]
+
+
+def test_http_zone_follows_next_page_links(fixture_server):
+    # 3 cartes puis 1 sur la page suivante : la dernière page n'est pas pleine
+    rows, errors, reports = run_zones(studapart_zone(fixture_server, "toulouse-1.html", page_size=3), workers=1)
+
+    assert not errors
+    assert [row[0] for row in rows] == ["Studio Capitole", "T1 Carmes", "T2 Compans", "Studio Rangueil"]
+    assert reports[0]["complet"]
+
+
+def test_full_last_page_goes_to_the_browser(fixture_server):
+    # Page pleine sans lien suivant : la suite se charge au défilement
+    def fallback(url, ville):
+        return [("navigateur", ville)]
+
+    zones = studapart_zone(fixture_server, "toulouse-2.html", page_size=1, fallback=fallback)
+    rows, _, reports = run_zones(zones, workers=1)
+    assert rows == [("navigateur", "Toulouse")]
+
+    # Sans navigateur, les annonces lues sont gardées et la zone est partielle
+    rows, _, reports = run_zones(studapart_zone(fixture_server, "toulouse-2.html", page_size=1), workers=1)
+    assert [row[0] for row in rows] == ["Studio Rangueil"]
+    assert not reports[0]["complet"]
+
+
+def test_scroll_until_stable_loads_every_page(fixture_server):
+    driver = StaticPageDriver()
+    driver.get(f"{fixture_server.url}/defilement/page1.html")
+    assert scroll_until_stable(driver, "div.card.col", max_rounds=10, timeout=0.5)
+
+    assert len(driver.find_elements(None, "div.card.col")) == 12
+    # Trois pages : deux scrolls qui ajoutent des cartes, un qui n'ajoute rien
+    assert driver.scrolls == 3
+
+
+def test_scroll_until_stable_stops_after_max_rounds(fixture_server):
+    driver = StaticPageDriver()
+    driver.get(f"{fixture_server.url}/defilement/page1.html")
+    # La liste grandit encore au dernier scroll : zone partielle
+    assert not scroll_until_stable(driver, "div.card.col", max_rounds=1, timeout=0.5)
+
+    assert len(driver.find_elements(None, "div.card.col")) == 8
+
+
+def test_driver_pool_bounds_browser_sessions(fixture_server):
+    created = []
+
+    def factory():
+        created.append(StaticPageDriver())
+        return created[-1]
+
+    def scrape_zone(driver, url, ville):
+        driver.get(url)
+        scroll_until_stable(driver, "div.card.col", max_rounds=4, timeout=0.2)
+        return [(ville, len(driver.find_elements(None, "div.card.col")))]
+
+    pool = DriverPool(size=2, factory=factory)
+    page = f"{fixture_server.url}/defilement/page1.html"
+    zones = [("Chrome", with_driver(pool, scrape_zone), f"{page}?zone={i}", f"zone {i}") for i in range(6)]
+    try:
+        rows, errors, _ = run_zones(zones, workers=4)
+    finally:
+        pool.close()
+
+    assert not errors
+    assert sorted(rows) == sorted((f"zone {i}", 12) for i in range(6))
+    # 4 threads mais 2 navigateurs au plus, réutilisés d'une zone à l'autre
+    assert len(created) <= 2
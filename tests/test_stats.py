@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from backend.stats import QUANTILES, QuantileSketch
+
+
+def sketch(values):
+    result = QuantileSketch()
+    for value in values:
+        result.add(value)
+    return result
+
+
+@pytest.mark.parametrize("values", [[500, 700], [500, 600, 900], [420, 480, 510, 650, 700, 980, 1200]])
+def test_small_groups_match_exact_quantiles(values):
+    qs = list(QUANTILES.values())
+    expected = np.quantile(values, qs)
+    assert sketch(values).quantiles(qs) == pytest.approx(expected, rel=0.02)
+
+
+def test_two_values_are_not_collapsed_to_the_minimum():
+    p25, median, p75, p90 = sketch([500, 700]).quantiles(list(QUANTILES.values()))
+    assert p25 < median < p75 < p90
+    assert p90 == pytest.approx(680, rel=0.02)
+
+
+def test_large_group_within_relative_error():
+    values = np.random.RandomState(0).lognormal(6.5, 0.4, 5000)
+    qs = list(QUANTILES.values())
+    assert sketch(values).quantiles(qs) == pytest.approx(np.quantile(values, qs), rel=0.02)
+
+
+def test_remove_merge_and_roundtrip():
+    a, b = sketch([500, 600, 700]), sketch([800, 900])
+    a.remove(600)
+    merged = QuantileSketch().merge(a).merge(b)
+    assert merged.count == 4 and merged.total == 2900
+    assert QuantileSketch.loads(merged.dumps()).summary() == merged.summary()
+    assert merged.summary()["median"] == pytest.approx(750, rel=0.02)
+
+
+def test_empty_sketch():
+    assert QuantileSketch().summary() == {"count": 0}
+    assert QuantileSketch().quantiles([0.5]) == [None]